@@ -0,0 +1,207 @@
+# Python
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import struct
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Generic, Hashable, Optional, TypeVar
+from uuid import UUID
+
+Value = TypeVar("Value")
+
+# Passwords
+
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password: str) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P)
+    return "scrypt${}${}${}${}${}".format(_SCRYPT_N, _SCRYPT_R, _SCRYPT_P, _b64(salt), _b64(digest))
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    _, n, r, p, salt, digest = encoded.split("$")
+    expected = _unb64(digest)
+    actual = hashlib.scrypt(
+        password.encode(), salt=_unb64(salt), n=int(n), r=int(r), p=int(p), dklen=len(expected)
+    )
+    return hmac.compare_digest(actual, expected)
+
+
+class Overloaded(Exception):
+    """Raised when too many password operations are already queued."""
+
+
+class PasswordHasher:
+    """Runs the password KDF in a process pool so it never blocks the event loop.
+
+    At most max_workers operations run at once and at most max_pending more
+    queue in the pool; beyond that calls fail fast with Overloaded. Workers
+    come from a fork server, since forking the threaded server process
+    itself can deadlock the child.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 256):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+
+    async def _run(self, function, *args):
+        if self._in_flight >= self.max_workers + self.max_pending:
+            raise Overloaded()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, function, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, encoded: str) -> bool:
+        return await self._run(verify_password, password, encoded)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# Sessions
+
+class TTLCache(Generic[Value]):
+    """Size-bounded mapping whose entries expire after ttl seconds."""
+
+    def __init__(self, ttl: float, capacity: int = 100_000):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Value]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def put(self, key: Hashable, value: Value, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_TOKEN = struct.Struct(">16sQ")
+
+
+class SessionTokens:
+    """Signed, expiring session tokens: user_id and expiry plus an HMAC.
+
+    Verified tokens are remembered for a while, so an authenticated request
+    usually costs one dictionary lookup.
+    """
+
+    def __init__(self, secret: bytes, lifetime: float = 3600, cache_ttl: float = 300):
+        self._secret = secret
+        self.lifetime = lifetime
+        self._verified: TTLCache[UUID] = TTLCache(cache_ttl)
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()[:16]
+
+    def issue(self, user_id: UUID) -> str:
+        payload = _TOKEN.pack(user_id.bytes, int(time.time() + self.lifetime))
+        return "{}.{}".format(_b64(payload), _b64(self._sign(payload)))
+
+    def verify(self, token: str) -> Optional[UUID]:
+        """Return the user_id the token was issued to, or None if it is invalid or expired."""
+        user_id = self._verified.get(token)
+        if user_id is not None:
+            return user_id
+        try:
+            payload, signature = (_unb64(part) for part in token.split("."))
+            key, expires = _TOKEN.unpack(payload)
+        except (ValueError, struct.error):
+            return None
+        remaining = expires - time.time()
+        if remaining <= 0 or not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        user_id = UUID(bytes=key)
+        self._verified.put(token, user_id, ttl=remaining)
+        return user_id
+
+
+# Throttling
+
+class AttemptLimiter:
+    """Throttles attempts per key with GCRA.
+
+    Each key costs a single float, the time at which its allowance is fully
+    restored; a key is blocked once burst attempts fall inside that
+    window. Attempts are charged up front and cleared on success, so
+    concurrent attempts cannot get past the limit while they are in
+    flight. At most capacity keys are tracked, least recently used keys
+    are forgotten first.
+    """
+
+    def __init__(self, burst: int = 5, period: float = 60.0, capacity: int = 100_000):
+        self.burst = burst
+        self.interval = period / burst
+        self.capacity = capacity
+        self._restored: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def attempt(self, key: Hashable) -> bool:
+        """Charge an attempt to key; False, charging nothing, when key is blocked."""
+        now = time.monotonic()
+        restored = max(self._restored.get(key, now), now)
+        if restored - now > (self.burst - 1) * self.interval:
+            return False
+        self._restored[key] = restored + self.interval
+        self._restored.move_to_end(key)
+        if len(self._restored) > self.capacity:
+            self._restored.popitem(last=False)
+        return True
+
+    def refund(self, key: Hashable) -> None:
+        """Give back an attempt that was never decided."""
+        restored = self._restored.get(key)
+        if restored is None:
+            return
+        restored -= self.interval
+        if restored <= time.monotonic():
+            del self._restored[key]
+        else:
+            self._restored[key] = restored
+
+    def succeeded(self, key: Hashable) -> None:
+        self._restored.pop(key, None)
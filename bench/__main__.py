@@ -0,0 +1,135 @@
+"""Benchmarks for the models and the API.
+
+    python -m bench [--scale small|medium|large] [--save results.json]
+                    [--baseline results.json] [--threshold 0.2]
+
+Runs pydantic microbenchmarks, then loads a synthetic dataset into the app
+and drives each endpoint in-process through ASGI. With --baseline, a file
+written by an earlier --save, exits with status 1 when any result
+regressed by more than --threshold or any endpoint returned more errors.
+"""
+
+# Python
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+from typing import Dict, List
+
+# Which way is better for each reported figure.
+_LOWER_IS_BETTER = ("us_per_op", "p50_ms", "p99_ms", "p999_ms")
+_HIGHER_IS_BETTER = ("rps",)
+
+Results = Dict[str, Dict[str, Dict[str, float]]]
+
+
+def compare(results: Results, baseline: Results, threshold: float) -> List[str]:
+    """Describe every figure that is more than threshold worse than the baseline."""
+    regressions = []
+    for section, cases in baseline.items():
+        if section == "meta":
+            continue
+        for case, figures in cases.items():
+            current = results.get(section, {}).get(case)
+            if current is None:
+                continue
+            for figure, before in figures.items():
+                after = current.get(figure)
+                if after is None:
+                    continue
+                if figure == "errors":
+                    if after > before:
+                        regressions.append("{} {} errors: {} -> {}".format(section, case, before, after))
+                    continue
+                if not before:
+                    continue
+                if figure in _LOWER_IS_BETTER:
+                    change = after / before - 1
+                elif figure in _HIGHER_IS_BETTER:
+                    change = before / after - 1 if after else float("inf")
+                else:
+                    continue
+                if change > threshold:
+                    regressions.append("{} {} {}: {:.4g} -> {:.4g} ({:+.0%} worse)".format(
+                        section, case, figure, before, after, change
+                    ))
+    return regressions
+
+
+def report(results: Results) -> None:
+    for section in ("micro", "load"):
+        print("\n[{}]".format(section))
+        for case, figures in results.get(section, {}).items():
+            values = "  ".join("{}={:.4g}".format(name, value) for name, value in figures.items())
+            print("{:<36} {}".format(case, values))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", default="small", help="small, medium or large")
+    parser.add_argument("--users", type=int, help="override the number of users of the scale")
+    parser.add_argument("--tweets-per-user", type=float, help="override the mean tweets per user")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent in-process clients")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression, 0.2 is 20%%")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="twitter-api-bench-") as workspace:
+        return run(arguments, workspace)
+
+
+def run(arguments: argparse.Namespace, workspace: str) -> int:
+    # The app opens its stores on import, so point them somewhere disposable first.
+    os.environ["TWEET_STORE"] = "log:" + os.path.join(workspace, "tweets")
+    os.environ["SEARCH_SNAPSHOT"] = os.path.join(workspace, "search.snapshot")
+    os.environ["INGEST_TOKEN"] = token = "bench"
+
+    from bench import datasets, load, models
+
+    users, tweets_per_user = datasets.SCALES[arguments.scale]
+    users = arguments.users or users
+    tweets_per_user = arguments.tweets_per_user or tweets_per_user
+
+    results: Results = {"meta": {
+        "python": platform.python_version(),
+        "scale": arguments.scale,
+        "users": users,
+        "tweets_per_user": tweets_per_user,
+        "requests": arguments.requests,
+        "concurrency": arguments.concurrency,
+    }}
+    if not arguments.skip_micro:
+        results["micro"] = models.run()
+    if not arguments.skip_load:
+        dataset = datasets.generate(users, tweets_per_user, arguments.seed)
+        results["meta"]["tweets"] = len(dataset.tweets)
+        results["meta"]["follows"] = len(dataset.follows)
+        results["load"] = asyncio.run(
+            load.run(dataset, token, arguments.requests, arguments.concurrency, arguments.seed)
+        )
+    report(results)
+
+    if arguments.save:
+        with open(arguments.save, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if arguments.baseline:
+        with open(arguments.baseline) as saved:
+            regressions = compare(results, json.load(saved), arguments.threshold)
+        if regressions:
+            print("\nRegressions beyond {:.0%}:".format(arguments.threshold))
+            print("\n".join(regressions))
+            return 1
+        print("\nNo regressions beyond {:.0%}.".format(arguments.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
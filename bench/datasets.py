@@ -0,0 +1,75 @@
+# Python
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Tuple
+from uuid import UUID
+
+_WORDS = (
+    "api fastapi python async tweet timeline search cache latency throughput "
+    "deploy review merge test bench coffee morning weekend release bug fix "
+    "feature design index store stream socket profile follow metrics"
+).split()
+_TAGS = ("python", "fastapi", "dev", "news", "music", "sports", "ai", "food")
+
+
+class Dataset(NamedTuple):
+    users: List[dict]
+    follows: List[Tuple[str, str]]
+    tweets: List[dict]
+
+
+SCALES: Dict[str, Tuple[int, float]] = {
+    # users, mean tweets per user
+    "small": (200, 10.0),
+    "medium": (2_000, 20.0),
+    "large": (20_000, 25.0),
+}
+
+
+def generate(users: int, tweets_per_user: float, seed: int = 1) -> Dataset:
+    """Build a reproducible dataset with heavy-tailed follower and tweet counts.
+
+    Popularity follows a Zipf-like law: the user of rank r is picked as a
+    followee with weight 1 / r, so a handful of accounts collect most of
+    the followers. The number of accounts each user follows and the number
+    of tweets each user writes are Pareto distributed.
+    """
+    rng = random.Random(seed)
+    ids = [str(UUID(int=rng.getrandbits(128), version=4)) for _ in range(users)]
+    profiles = [
+        {
+            "user_id": user_id,
+            "email": "user{}@bench.example.com".format(number),
+            "first_name": "User",
+            "last_name": str(number),
+            "birth_date": "19{:02d}-01-01".format(50 + number % 50)
+        }
+        for number, user_id in enumerate(ids)
+    ]
+
+    weights = [1.0 / rank for rank in range(1, users + 1)]
+    follows = []
+    for user_id in ids:
+        wanted = min(users - 1, int(rng.paretovariate(1.5) * 5))
+        followees = set(rng.choices(ids, weights=weights, k=wanted))
+        followees.discard(user_id)
+        follows.extend((user_id, followee) for followee in followees)
+
+    # Pareto with alpha 2 has mean 2, so scale by half the wanted mean.
+    start = datetime(2021, 11, 1)
+    tweets = []
+    for user_id in ids:
+        for _ in range(int(rng.paretovariate(2.0) * tweets_per_user / 2)):
+            words = rng.sample(_WORDS, rng.randint(3, 12))
+            if rng.random() < 0.3:
+                words.append("#" + rng.choice(_TAGS))
+            if rng.random() < 0.2:
+                words.append("@user{}".format(rng.randrange(users)))
+            tweets.append({
+                "tweet_id": str(UUID(int=rng.getrandbits(128), version=4)),
+                "content": " ".join(words),
+                "create_at": (start + timedelta(seconds=rng.randrange(30 * 86_400))).isoformat(),
+                "by": user_id
+            })
+    tweets.sort(key=lambda tweet: tweet["create_at"])
+    return Dataset(users=profiles, follows=follows, tweets=tweets)
@@ -0,0 +1,189 @@
+# Python
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+from uuid import UUID, uuid4
+
+# App
+import main
+
+from bench.datasets import Dataset
+
+Request = Tuple[str, str, Dict[str, str], Dict[str, str], bytes]
+
+
+class ASGIClient:
+    """Drives an ASGI app in-process, without sockets."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        query: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b""
+    ) -> Tuple[int, bytes]:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": urlencode(query or {}).encode(),
+            "headers": [
+                (name.lower().encode(), value.encode())
+                for name, value in dict({"host": "bench", "content-length": str(len(body))}, **(headers or {})).items()
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        done = asyncio.Event()
+        sent = False
+        status = 500
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status, b"".join(chunks)
+
+    async def lifespan(self, event: str) -> None:
+        if event == "startup":
+            await self.app.router.startup()
+        else:
+            await self.app.router.shutdown()
+
+
+async def _bulk(client: ASGIClient, path: str, records: List[dict], token: str) -> None:
+    body = "\n".join(map(json.dumps, records)).encode()
+    status, report = await client.request("POST", path, headers={"authorization": "Bearer " + token}, body=body)
+    summary = json.loads(report.splitlines()[-1])
+    if status != 200 or summary["rejected"]:
+        raise RuntimeError("loading {} failed: {}".format(path, report[:500]))
+
+
+async def populate(client: ASGIClient, dataset: Dataset, token: str) -> None:
+    """Load users and tweets through the bulk endpoints, follows straight into the graph."""
+    await _bulk(client, "/users:bulk", dataset.users, token)
+    for follower, followee in dataset.follows:
+        main.timelines.follow(UUID(follower), UUID(followee))
+    await _bulk(client, "/tweets:bulk", dataset.tweets, token)
+
+
+def scenarios(dataset: Dataset, rng: random.Random) -> Dict[str, Callable[[], Request]]:
+    """Request factories for each benchmarked endpoint, keyed by route."""
+    user_ids = [user["user_id"] for user in dataset.users]
+    tweet_ids = [tweet["tweet_id"] for tweet in dataset.tweets]
+    # Reads are skewed towards popular users and recent tweets.
+    hot_users = user_ids[:max(1, len(user_ids) // 20)]
+    recent = tweet_ids[-max(1, len(tweet_ids) // 10):]
+    tokens = {user_id: main.sessions.issue(UUID(user_id)) for user_id in user_ids[:100]}
+    queries = ["python", "#python", "api OR cache", "timeline latency", "#dev OR #ai"]
+
+    def get_tweet():
+        return "GET", "/tweets/{}".format(rng.choice(recent)), {}, {}, b""
+
+    def get_user():
+        return "GET", "/users/{}".format(rng.choice(hot_users)), {}, {}, b""
+
+    def timeline():
+        return "GET", "/users/{}/timeline".format(rng.choice(user_ids)), {"limit": "20"}, {}, b""
+
+    def search():
+        return "GET", "/search", {"q": rng.choice(queries), "limit": "20"}, {}, b""
+
+    def post_tweet():
+        author = rng.choice(list(tokens))
+        body = json.dumps({"tweet_id": str(uuid4()), "content": "bench #python post", "by": author})
+        headers = {"authorization": "Bearer " + tokens[author], "content-type": "application/json"}
+        return "POST", "/tweets", {}, headers, body.encode()
+
+    return {
+        "GET /tweets/{tweet_id}": get_tweet,
+        "GET /users/{user_id}": get_user,
+        "GET /users/{user_id}/timeline": timeline,
+        "GET /search": search,
+        "POST /tweets": post_tweet,
+    }
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def drive(
+    client: ASGIClient,
+    make: Callable[[], Request],
+    requests: int,
+    concurrency: int
+) -> Dict[str, float]:
+    """Send requests from concurrency workers; report throughput and latency in ms."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, path, query, headers, body = make()
+            started = time.perf_counter()
+            status, _ = await client.request(method, path, query, headers, body)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "p999_ms": percentile(latencies, 0.999) * 1e3,
+        "errors": errors,
+    }
+
+
+async def run(dataset: Dataset, token: str, requests: int, concurrency: int, seed: int = 1) -> Dict[str, Dict[str, float]]:
+    client = ASGIClient(main.app)
+    await client.lifespan("startup")
+    try:
+        await populate(client, dataset, token)
+        rng = random.Random(seed)
+        results = {}
+        for name, make in scenarios(dataset, rng).items():
+            # One short pass first so caches and code paths are warm.
+            await drive(client, make, max(1, requests // 10), concurrency)
+            results[name] = await drive(client, make, requests, concurrency)
+        return results
+    finally:
+        await client.lifespan("shutdown")
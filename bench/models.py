@@ -0,0 +1,53 @@
+# Python
+import timeit
+from typing import Callable, Dict
+from uuid import UUID, uuid4
+
+# Pydantic
+from pydantic import BaseModel, Field
+
+# App
+from main import Tweet, UserBase, UserLogin, Users
+
+
+class _PlainEmailUser(BaseModel):
+    """UserBase with a plain str email, to isolate what EmailStr costs."""
+    user_id: UUID = Field(...)
+    email: str = Field(...)
+
+
+def _time(function: Callable[[], object], repeat: int = 5) -> float:
+    """Best of repeat runs, in microseconds per call."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    user_id = str(uuid4())
+    base = {"user_id": user_id, "email": "someone@example.com"}
+    login = dict(base, password="correct horse battery")
+    user = dict(base, first_name="Some", last_name="One", birth_date="1990-05-17")
+    tweet = {
+        "tweet_id": str(uuid4()),
+        "content": "benchmarking #python models with @someone " * 3,
+        "create_at": "2021-11-04T10:00:00",
+        "by": user_id
+    }
+    cases = {
+        "UserBase": (UserBase, base),
+        "UserBase.email_as_str": (_PlainEmailUser, base),
+        "UserLogin": (UserLogin, login),
+        "Users": (Users, user),
+        "Tweet": (Tweet, tweet),
+    }
+    results = {}
+    for name, (model, data) in cases.items():
+        instance = model.parse_obj(data)
+        results[name + ".validate"] = {"us_per_op": _time(lambda: model.parse_obj(data))}
+        results[name + ".json"] = {"us_per_op": _time(instance.json)}
+    results["EmailStr.overhead"] = {
+        "us_per_op": max(0.0, results["UserBase.validate"]["us_per_op"]
+                         - results["UserBase.email_as_str.validate"]["us_per_op"])
+    }
+    return results
@@ -0,0 +1,162 @@
+# Python
+import asyncio
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+# Starlette
+from starlette.concurrency import run_in_threadpool
+
+# What a loader returns: the encoded body, a timestamp identifying its
+# content (update_at or create_at in microseconds, 0 when there is none),
+# and tags beyond the key that invalidate it.
+Loaded = Tuple[bytes, int, Iterable[str]]
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: Optional[str]
+    expires: float
+    tags: Tuple[str, ...]
+
+
+def etag_matches(header: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an If-None-Match header matches etag, using weak comparison."""
+    if not header or not etag:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.replace("W/", "", 1) == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """LRU cache of encoded response bodies, bounded in bytes and by age.
+
+    Entries are found by key and invalidated by key or by any of their
+    tags. Every invalidation takes the next number of a sequence and
+    records it as the version of the tag, and every entry carries a strong
+    ETag made of its content timestamp and the highest version among its
+    tags. Writes elsewhere leave the ETag alone, while an entry filled
+    after a change to one of its tags never repeats an old ETag.
+
+    Versions of at most max_versions tags are remembered; forgotten tags
+    fall back to the highest version forgotten so far, so a version never
+    goes backwards.
+
+    Concurrent misses on one key share a single load. A load that overlaps
+    an invalidation of one of its tags may have read stale data, so it is
+    returned without an ETag and not cached.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 60.0, max_versions: int = 100_000):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_versions = max_versions
+        self.size = 0
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._tagged: Dict[str, Set[str]] = {}
+        self._sequence = 0
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = Lock()
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    async def get(self, key: str, load: Callable[[], Optional[Loaded]]) -> Optional[CachedResponse]:
+        """The cached response for key, calling load in the threadpool on a miss.
+
+        load returns None when there is nothing to serve; that is not cached.
+        """
+        entry = self.peek(key)
+        if entry is not None:
+            return entry
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        pending = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            entry = await self._load(key, load)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as error:
+            pending.set_exception(error)
+            # Retrieve it so a failure nobody waited for is not logged.
+            pending.exception()
+            raise
+        else:
+            pending.set_result(entry)
+            return entry
+        finally:
+            del self._loading[key]
+
+    async def _load(self, key: str, load: Callable[[], Optional[Loaded]]) -> Optional[CachedResponse]:
+        started = self._sequence
+        loaded = await run_in_threadpool(load)
+        if loaded is None:
+            return None
+        body, stamp, tags = loaded
+        tags = (key, *tags)
+        with self._lock:
+            version = max(map(self._version, tags))
+            entry = CachedResponse(
+                body=body,
+                etag='"{:x}-{:x}"'.format(stamp, version),
+                expires=time.monotonic() + self.ttl,
+                tags=tags
+            )
+            if version > started:
+                return entry._replace(etag=None)
+            if len(body) > self.max_bytes:
+                return entry
+            self._discard(key)
+            self._entries[key] = entry
+            self.size += len(body)
+            for tag in entry.tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, tag: str) -> None:
+        """Drop every entry keyed or tagged with tag. Safe to call from any thread."""
+        with self._lock:
+            self._sequence += 1
+            self._versions[tag] = self._sequence
+            self._versions.move_to_end(tag)
+            if len(self._versions) > self.max_versions:
+                _, self._forgotten = self._versions.popitem(last=False)
+            for key in tuple(self._tagged.get(tag, ())):
+                self._discard(key)
+            self._discard(tag)
+
+    def _version(self, tag: str) -> int:
+        return self._versions.get(tag, self._forgotten)
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
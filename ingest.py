@@ -0,0 +1,126 @@
+# Python
+import json
+from operator import itemgetter
+from typing import Any, AsyncIterator, Callable, Generic, List, Tuple, Type, TypeVar
+
+# Pydantic
+from pydantic import BaseModel, ValidationError
+
+# Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+Model = TypeVar("Model", bound=BaseModel)
+
+# A chunk of validated records, each with its line number. The commit
+# callback stores them as one batch and returns the (line, error) pairs
+# it rejected.
+Commit = Callable[[List[Tuple[int, Model]]], List[Tuple[int, Any]]]
+
+
+class NDJSONResponse(StreamingResponse):
+    """Streams newline-delimited JSON while the request body is still being read.
+
+    StreamingResponse listens for a disconnect on receive() while it
+    streams, which would swallow the body chunks the generator is reading,
+    so this response only streams.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a byte stream into numbered, non-blank lines of at most max_line bytes.
+
+    Longer lines are yielded empty so they are reported without being buffered.
+    """
+    pending = bytearray()
+    number = 0
+    overflow = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            number += 1
+            if overflow:
+                overflow = False
+                yield number, b""
+            else:
+                pending += chunk[start:end]
+                if len(pending) > max_line:
+                    yield number, b""
+                elif pending.strip():
+                    yield number, bytes(pending)
+            pending.clear()
+            start = end + 1
+        if not overflow:
+            pending += chunk[start:]
+            if len(pending) > max_line:
+                overflow = True
+                pending.clear()
+    if overflow:
+        yield number + 1, b""
+    elif pending.strip():
+        yield number + 1, bytes(pending)
+
+
+class Ingest(Generic[Model]):
+    """Validates and commits an NDJSON upload chunk by chunk.
+
+    Only one chunk is held in memory at a time. Validation and the commit
+    run in the threadpool, and every rejected record is streamed back as
+    {"line": ..., "error": ...}, followed by a final summary line.
+    """
+
+    def __init__(self, model: Type[Model], commit: Commit, chunk_size: int = 1000, max_line: int = 64 * 1024):
+        self.model = model
+        self.commit = commit
+        self.chunk_size = chunk_size
+        self.max_line = max_line
+
+    def _process(self, lines: List[Tuple[int, bytes]]) -> Tuple[int, bytes]:
+        records: List[Tuple[int, Model]] = []
+        errors: List[Tuple[int, Any]] = []
+        for number, line in lines:
+            if not line:
+                errors.append((number, "line longer than {} bytes".format(self.max_line)))
+                continue
+            try:
+                records.append((number, self.model.parse_raw(line)))
+            except ValidationError as error:
+                errors.append((number, error.errors()))
+        if records:
+            errors.extend(self.commit(records))
+        errors.sort(key=itemgetter(0))
+        report = b"".join(
+            json.dumps({"line": number, "error": error}, default=str).encode() + b"\n"
+            for number, error in errors
+        )
+        return len(errors), report
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        received = rejected = 0
+        batch: List[Tuple[int, bytes]] = []
+        async for line in ndjson_lines(chunks, self.max_line):
+            batch.append(line)
+            if len(batch) < self.chunk_size:
+                continue
+            failed, report = await run_in_threadpool(self._process, batch)
+            received, rejected = received + len(batch), rejected + failed
+            batch = []
+            if report:
+                yield report
+        if batch:
+            failed, report = await run_in_threadpool(self._process, batch)
+            received, rejected = received + len(batch), rejected + failed
+            if report:
+                yield report
+        yield json.dumps({"accepted": received - rejected, "rejected": rejected}).encode() + b"\n"
@@ -1,18 +1,64 @@
 # Python
+import asyncio
+import hmac
+import json
+import os
+from functools import partial
 from uuid import UUID
-from datetime import date, datetime
-from typing import Optional
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
 # Pydantic
 from pydantic import BaseModel
 from pydantic import EmailStr
 from pydantic import Field
+from pydantic import validator
 
 # FastApi
 from fastapi import FastAPI
+from fastapi import Depends, HTTPException, Path, Query, Request, status
+from fastapi import Header, WebSocket
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+# Storage
+from storage import TweetRecord, as_utc, decode_tweet, encode_tweet, open_store, to_micros
+
+# Users
+from users import UserCache
+
+# Timeline
+from timeline import FollowGraph, TimelineEngine
+from timeline import decode_cursor, encode_cursor
+
+# Search
+import search
+from search import SearchIndex
+
+# Auth
+from auth import AttemptLimiter, Overloaded, PasswordHasher, SessionTokens
+from auth import hash_password
+
+# Ingest
+from ingest import Ingest, NDJSONResponse
+
+# Stream
+from stream import FanoutHub, Frame, Subscriber
+
+# Metrics
+from metrics import Metrics, MetricsMiddleware, SamplingProfiler
+from metrics import instrument_validation
+
+# Cache
+from cache import CachedResponse, ResponseCache, etag_matches
 
 app = FastAPI()
 
+metrics = Metrics()
+profiler = SamplingProfiler()
+instrument_validation()
+app.add_middleware(MetricsMiddleware, metrics=metrics, profiler=profiler)
+
 # Models
 
 class UserBase(BaseModel):
@@ -46,13 +92,643 @@ class Tweet(BaseModel):
         min_length=1,
         max_length=256
     )
-    create_at: datetime =Field(default=datetime.now())
+    create_at: datetime =Field(default_factory=lambda: datetime.now(timezone.utc))
     update_at: Optional[datetime] =Field(default=None) 
-    by: Users = Field(...)
+    by: UUID = Field(...)
+
+    @validator("create_at", "update_at")
+    def in_utc(cls, value):
+        # Times are kept in UTC; naive ones are taken to be UTC already.
+        if value is None:
+            return value
+        try:
+            return as_utc(value)
+        except OverflowError:
+            raise ValueError("date is out of range")
+
+class TweetView(Tweet):
+    author: Optional[Users] = Field(default=None)
+
+class UserRegister(Users, UserLogin):
+    pass
+
+class Session(BaseModel):
+    access_token: str = Field(...)
+    token_type: str = Field(default="bearer")
+
+class TweetPage(BaseModel):
+    tweets: List[TweetView] = Field(...)
+    next_cursor: Optional[str] = Field(default=None)
+
+# State
+
+# Everything below trusts what it reads back from the stores: it was
+# validated on the way in, so models are built with construct().
+
+def load_user(raw: bytes) -> Users:
+    fields = json.loads(raw)
+    birth_date = fields["birth_date"]
+    return Users.construct(
+        user_id=UUID(fields["user_id"]),
+        email=fields["email"],
+        first_name=fields["first_name"],
+        last_name=fields["last_name"],
+        birth_date=date.fromisoformat(birth_date) if birth_date else None
+    )
+
+profiles: Dict[UUID, bytes] = {}
+emails: Dict[str, UUID] = {}
+credentials: Dict[UUID, str] = {}
+authors = UserCache(profiles.get, load_user)
+hasher = PasswordHasher()
+sessions = SessionTokens(os.getenv("SESSION_SECRET", "").encode() or os.urandom(32))
+login_attempts = AttemptLimiter()
+# Verified against when the email is unknown, so both paths cost one KDF.
+UNKNOWN_USER_HASH = hash_password(os.urandom(16).hex())
+tweets = open_store(os.getenv("TWEET_STORE", "log:data/tweets"))
+timelines = TimelineEngine(FollowGraph())
+SEARCH_SNAPSHOT = os.getenv("SEARCH_SNAPSHOT", "data/search.snapshot")
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+firehose = FanoutHub(
+    timelines.graph,
+    capacity=int(os.getenv("STREAM_QUEUE_SIZE", "256")),
+    policy=os.getenv("STREAM_SLOW_CONSUMER", "drop_oldest")
+)
+STREAM_KEEPALIVE = 15.0
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+)
+
+
+def dump_tweet(tweet: Tweet) -> bytes:
+    return encode_tweet(tweet.content, tweet.create_at, tweet.update_at, tweet.by.bytes)
+
+def tweet_frame(tweet: Tweet) -> Frame:
+    record = TweetRecord(tweet.tweet_id, tweet.content, tweet.create_at, tweet.update_at, tweet.by.bytes)
+    return Frame(tweet.tweet_id, tweet.by, partial(render_tweet, record))
+
+def index_tweet(tweet: Tweet, created: int) -> None:
+    """Add a stored tweet to timelines and search; created is derived before storing it.
+
+    Only tweets posted live go to the firehose, so bulk ingest does not
+    replay a backfill to every stream.
+    """
+    timelines.publish(tweet.by, tweet.tweet_id, created)
+    search_index.add(tweet.tweet_id, created, tweet.content)
+
+def read_tweet(tweet_id: UUID) -> Optional[TweetRecord]:
+    payload = tweets.get(tweet_id)
+    return None if payload is None else decode_tweet(tweet_id, payload)
+
+def render_tweet(record: TweetRecord) -> bytes:
+    """Encode a record as a TweetView, splicing in the cached author JSON."""
+    author_id = UUID(bytes=record.author)
+    head = json.dumps({
+        "tweet_id": str(record.tweet_id),
+        "content": record.content,
+        "create_at": record.create_at.isoformat(),
+        "update_at": record.update_at.isoformat() if record.update_at else None,
+        "by": str(author_id)
+    }, ensure_ascii=False)
+    return b"".join((
+        head[:-1].encode(),
+        b', "author": ',
+        authors.fragment(author_id) or b"null",
+        b"}"
+    ))
+
+def json_response(body: bytes, status_code: int = status.HTTP_200_OK) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+def cached_response(entry: CachedResponse, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": entry.etag} if entry.etag else None
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def page_response(tweet_ids: List[UUID], next_cursor: Optional[str]) -> Response:
+    records = [record for record in map(read_tweet, tweet_ids) if record is not None]
+    return json_response(b"".join((
+        b'{"tweets": [',
+        b", ".join(map(render_tweet, records)),
+        b'], "next_cursor": ',
+        json.dumps(next_cursor).encode(),
+        b"}"
+    )))
+
+def open_search_index(path: str) -> SearchIndex:
+    """Load the snapshot written at the last clean shutdown, else rebuild from the store."""
+    if os.path.exists(path):
+        try:
+            return SearchIndex.load(path)
+        except Exception:
+            # Unreadable or from another version: rebuild below.
+            pass
+        finally:
+            # After a crash the snapshot would be stale, so it is only good once.
+            os.remove(path)
+    index = SearchIndex()
+    for tweet_id, payload in tweets.scan():
+        record = decode_tweet(tweet_id, payload)
+        index.add(tweet_id, to_micros(record.create_at), record.content)
+    return index
+
+search_index = open_search_index(SEARCH_SNAPSHOT)
+
+
+@app.on_event("shutdown")
+def close_store():
+    profiler.stop()
+    hasher.close()
+    try:
+        search_index.save(SEARCH_SNAPSHOT)
+    finally:
+        tweets.close()
+
+
+bearer = HTTPBearer(auto_error=False)
+
+async def current_user(token: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> UUID:
+    user_id = sessions.verify(token.credentials) if token else None
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user_id
+
+def require_user(user_id: UUID, session_user: UUID) -> None:
+    if user_id != session_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed for this user")
+
+def claim_email(email: str, user_id: UUID) -> bool:
+    """Map email to user_id; True when this call made the mapping."""
+    claimed = emails.setdefault(email.lower(), user_id)
+    if claimed != user_id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
+    # setdefault hands back our own object only if it stored it.
+    return claimed is user_id
 
+def release_email(email: str, user_id: UUID) -> None:
+    key = email.lower()
+    if emails.get(key) == user_id:
+        emails.pop(key, None)
 
+def token_access(expected: str, feature: str):
+    """Dependency requiring expected as the bearer token; the feature is off when it is empty."""
+    async def check(token: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> None:
+        if not expected:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=feature + " is disabled")
+        if token is None or not hmac.compare_digest(token.credentials, expected):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+    return check
+
+ingest_access = token_access(INGEST_TOKEN, "Bulk ingest")
+admin_access = token_access(ADMIN_TOKEN, "Administration")
+
+def commit_users(records: List[Tuple[int, Users]]) -> List[Tuple[int, str]]:
+    # Emails and user_ids are claimed with setdefault, which only hands back
+    # our own object when it stored it, so concurrent signups can't be
+    # overwritten.
+    errors = []
+    for number, user in records:
+        if user.user_id in profiles:
+            errors.append((number, "User already exists"))
+            continue
+        if emails.setdefault(user.email.lower(), user.user_id) is not user.user_id:
+            errors.append((number, "Email already registered"))
+            continue
+        profile = user.json().encode()
+        if profiles.setdefault(user.user_id, profile) is not profile:
+            release_email(user.email, user.user_id)
+            errors.append((number, "User already exists"))
+    return errors
+
+def commit_tweets(records: List[Tuple[int, Tweet]]) -> List[Tuple[int, str]]:
+    errors = []
+    accepted: Dict[UUID, Tuple[int, Tweet]] = {}
+    for number, tweet in records:
+        if tweet.by not in profiles:
+            errors.append((number, "Author not found"))
+        elif tweet.tweet_id in accepted:
+            errors.append((number, "Tweet already exists"))
+        else:
+            accepted[tweet.tweet_id] = (number, tweet)
+    prepared = [(tweet, to_micros(tweet.create_at)) for _, tweet in accepted.values()]
+    stored = set(tweets.add_many([(tweet.tweet_id, dump_tweet(tweet)) for tweet, _ in prepared]))
+    for tweet, created in prepared:
+        if tweet.tweet_id in stored:
+            index_tweet(tweet, created)
+        else:
+            errors.append((accepted[tweet.tweet_id][0], "Tweet already exists"))
+    return errors
+
+user_ingest = Ingest(Users, commit_users)
+tweet_ingest = Ingest(Tweet, commit_tweets)
 
 
 @app.get(path="/")
 def home():
-    return {"Twitter Api":"Working!"}
\ No newline at end of file
+    return {"Twitter Api":"Working!"}
+
+## Auth
+
+@app.post(
+    path="/signup",
+    response_model=Users,
+    status_code=status.HTTP_201_CREATED
+)
+async def signup(user: UserRegister):
+    # Claim the email before awaiting the hash so concurrent signups can't
+    # both take it; a repeated signup finds the claim already made.
+    if user.user_id in profiles or not claim_email(user.email, user.user_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already exists")
+    try:
+        credential = await hasher.hash(user.password)
+    except Overloaded:
+        release_email(user.email, user.user_id)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many signups in progress",
+            headers={"Retry-After": "1"}
+        )
+    except BaseException:
+        release_email(user.email, user.user_id)
+        raise
+    if user.user_id in profiles:
+        release_email(user.email, user.user_id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already exists")
+    credentials[user.user_id] = credential
+    profile = Users(**user.dict(exclude={"password"}))
+    profiles[user.user_id] = profile.json().encode()
+    return profile
+
+@app.post(
+    path="/login",
+    response_model=Session
+)
+async def login(user: UserLogin):
+    key = user.email.lower()
+    # Charged before the KDF runs, so concurrent guesses count against the limit.
+    if not login_attempts.attempt(key):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed logins",
+            headers={"Retry-After": str(int(login_attempts.interval) + 1)}
+        )
+    user_id = emails.get(key)
+    credential = credentials.get(user_id) if user_id == user.user_id else None
+    try:
+        verified = await hasher.verify(user.password, credential or UNKNOWN_USER_HASH)
+    except Overloaded:
+        login_attempts.refund(key)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress",
+            headers={"Retry-After": "1"}
+        )
+    except BaseException:
+        login_attempts.refund(key)
+        raise
+    if not verified or credential is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    login_attempts.succeeded(key)
+    return Session(access_token=sessions.issue(user.user_id))
+
+## Users
+
+@app.post(
+    path="/users",
+    response_model=Users,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(ingest_access)]
+)
+def create_user(user: Users):
+    """Import a profile without credentials; people sign up through /signup."""
+    if user.user_id in profiles or not claim_email(user.email, user.user_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already exists")
+    profile = user.json().encode()
+    if profiles.setdefault(user.user_id, profile) is not profile:
+        release_email(user.email, user.user_id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already exists")
+    return user
+
+@app.get(
+    path="/users/{user_id}",
+    response_model=Users
+)
+async def show_user(
+    user_id: UUID = Path(...),
+    if_none_match: Optional[str] = Header(default=None)
+):
+    def load():
+        fragment = authors.fragment(user_id)
+        return None if fragment is None else (fragment, 0, ())
+
+    entry = await response_cache.get("user:{}".format(user_id), load)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return cached_response(entry, if_none_match)
+
+@app.put(
+    path="/users/{user_id}",
+    response_model=Users
+)
+def update_user(
+    user: Users,
+    user_id: UUID = Path(...),
+    session_user: UUID = Depends(current_user)
+):
+    require_user(user_id, session_user)
+    if user.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_id does not match the path")
+    previous = authors.get(user_id)
+    if previous is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if previous.email.lower() != user.email.lower():
+        claim_email(user.email, user_id)
+        emails.pop(previous.email.lower(), None)
+    profiles[user_id] = user.json().encode()
+    authors.invalidate(user_id)
+    response_cache.invalidate("user:{}".format(user_id))
+    return user
+
+@app.post(
+    path="/users:bulk",
+    response_class=NDJSONResponse,
+    dependencies=[Depends(ingest_access)]
+)
+async def bulk_users(request: Request):
+    return NDJSONResponse(user_ingest.run(request.stream()))
+
+@app.post(
+    path="/users/{user_id}/following/{followee_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response
+)
+def follow(
+    user_id: UUID = Path(...),
+    followee_id: UUID = Path(...),
+    session_user: UUID = Depends(current_user)
+):
+    require_user(user_id, session_user)
+    if user_id not in profiles or followee_id not in profiles:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if user_id == followee_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Users cannot follow themselves")
+    timelines.follow(user_id, followee_id)
+
+@app.delete(
+    path="/users/{user_id}/following/{followee_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response
+)
+def unfollow(
+    user_id: UUID = Path(...),
+    followee_id: UUID = Path(...),
+    session_user: UUID = Depends(current_user)
+):
+    require_user(user_id, session_user)
+    if not timelines.unfollow(user_id, followee_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not following")
+
+@app.get(
+    path="/users/{user_id}/timeline",
+    response_model=TweetPage
+)
+def timeline(
+    user_id: UUID = Path(...),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100)
+):
+    if user_id not in profiles:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    tweet_ids, next_position = timelines.read(user_id, limit, position)
+    return page_response(tweet_ids, encode_cursor(next_position) if next_position else None)
+
+## Tweets
+
+@app.post(
+    path="/tweets",
+    response_model=Tweet,
+    status_code=status.HTTP_201_CREATED
+)
+def post_tweet(tweet: Tweet, session_user: UUID = Depends(current_user)):
+    require_user(tweet.by, session_user)
+    if tweet.by not in profiles:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Author not found")
+    payload, created, frame = dump_tweet(tweet), to_micros(tweet.create_at), tweet_frame(tweet)
+    if not tweets.add(tweet.tweet_id, payload):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Tweet already exists")
+    index_tweet(tweet, created)
+    firehose.publish(frame)
+    return tweet
+
+@app.post(
+    path="/tweets:bulk",
+    response_class=NDJSONResponse,
+    dependencies=[Depends(ingest_access)]
+)
+async def bulk_tweets(request: Request):
+    return NDJSONResponse(tweet_ingest.run(request.stream()))
+
+@app.get(
+    path="/tweets/{tweet_id}",
+    response_model=TweetView
+)
+async def show_tweet(
+    tweet_id: UUID = Path(...),
+    if_none_match: Optional[str] = Header(default=None)
+):
+    def load():
+        record = read_tweet(tweet_id)
+        if record is None:
+            return None
+        stamp = to_micros(record.update_at or record.create_at)
+        # The author's profile is embedded, so profile changes invalidate it too.
+        return render_tweet(record), stamp, ("user:{}".format(UUID(bytes=record.author)),)
+
+    entry = await response_cache.get("tweet:{}".format(tweet_id), load)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
+    return cached_response(entry, if_none_match)
+
+@app.put(
+    path="/tweets/{tweet_id}",
+    response_model=TweetView
+)
+def update_tweet(
+    tweet: Tweet,
+    tweet_id: UUID = Path(...),
+    session_user: UUID = Depends(current_user)
+):
+    require_user(tweet.by, session_user)
+    if tweet.tweet_id != tweet_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="tweet_id does not match the path")
+    record = read_tweet(tweet_id)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
+    if tweet.by != UUID(bytes=record.author):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tweets can only be edited by their author")
+    edited = record._replace(content=tweet.content, update_at=datetime.now(timezone.utc))
+    # Replaced atomically, so an edit racing a delete can't bring the tweet back.
+    previous = tweets.replace(tweet_id, encode_tweet(edited.content, edited.create_at, edited.update_at, edited.author))
+    if previous is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
+    response_cache.invalidate("tweet:{}".format(tweet_id))
+    search_index.update(tweet_id, decode_tweet(tweet_id, previous).content, edited.content)
+    return json_response(render_tweet(edited))
+
+@app.delete(
+    path="/tweets/{tweet_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response
+)
+def delete_tweet(tweet_id: UUID = Path(...), session_user: UUID = Depends(current_user)):
+    record = read_tweet(tweet_id)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
+    require_user(UUID(bytes=record.author), session_user)
+    if not tweets.delete(tweet_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tweet not found")
+    response_cache.invalidate("tweet:{}".format(tweet_id))
+    search_index.remove(tweet_id, record.content)
+
+## Search
+
+@app.get(
+    path="/search",
+    response_model=TweetPage
+)
+def search_tweets(
+    q: str = Query(..., min_length=1, max_length=256),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100)
+):
+    try:
+        before = search.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    tweet_ids, next_before = search_index.search(q, limit, before)
+    return page_response(tweet_ids, search.encode_cursor(next_before) if next_before else None)
+
+## Stream
+
+async def server_sent_events(subscriber: Subscriber):
+    try:
+        while True:
+            try:
+                frame = await subscriber.get(timeout=STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame.event
+    finally:
+        firehose.unsubscribe(subscriber)
+
+async def pump(websocket: WebSocket, subscriber: Subscriber) -> None:
+    await websocket.accept()
+
+    async def watch_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+        subscriber.close()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        while True:
+            frame = await subscriber.get()
+            if frame is None:
+                break
+            await websocket.send_text(frame.text)
+    finally:
+        firehose.unsubscribe(subscriber)
+        disconnected = watcher.done()
+        watcher.cancel()
+    if not disconnected:
+        # Dropped by the slow consumer policy rather than by the client.
+        await websocket.close(code=1008)
+
+@app.get(
+    path="/stream",
+    response_class=StreamingResponse
+)
+async def stream(
+    last_id: Optional[UUID] = Query(default=None),
+    last_event_id: Optional[UUID] = Header(default=None)
+):
+    subscriber = firehose.subscribe(None, last_id or last_event_id)
+    return StreamingResponse(server_sent_events(subscriber), media_type="text/event-stream")
+
+@app.websocket(path="/stream")
+async def stream_socket(websocket: WebSocket, last_id: Optional[UUID] = Query(default=None)):
+    await pump(websocket, firehose.subscribe(None, last_id))
+
+@app.get(
+    path="/users/{user_id}/stream",
+    response_class=StreamingResponse
+)
+async def user_stream(
+    user_id: UUID = Path(...),
+    last_id: Optional[UUID] = Query(default=None),
+    last_event_id: Optional[UUID] = Header(default=None)
+):
+    if user_id not in profiles:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    subscriber = firehose.subscribe(user_id, last_id or last_event_id)
+    return StreamingResponse(server_sent_events(subscriber), media_type="text/event-stream")
+
+@app.websocket(path="/users/{user_id}/stream")
+async def user_stream_socket(
+    websocket: WebSocket,
+    user_id: UUID = Path(...),
+    last_id: Optional[UUID] = Query(default=None)
+):
+    if user_id not in profiles:
+        await websocket.close(code=1008)
+        return
+    await pump(websocket, firehose.subscribe(user_id, last_id))
+
+## Metrics
+
+@app.get(
+    path="/metrics",
+    response_class=PlainTextResponse
+)
+def show_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.put(
+    path="/debug/profiler",
+    dependencies=[Depends(admin_access)]
+)
+def toggle_profiler(
+    enabled: bool = Query(...),
+    interval: Optional[float] = Query(default=None, gt=0, le=1)
+):
+    if enabled:
+        profiler.start(interval)
+    else:
+        profiler.stop()
+    return {"running": profiler.running, "interval": profiler.interval}
+
+@app.get(
+    path="/debug/profiler",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(admin_access)]
+)
+def show_profile():
+    return PlainTextResponse(profiler.dump())
@@ -0,0 +1,294 @@
+# Python
+import contextvars
+import heapq
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# FastApi
+import fastapi.dependencies.utils
+import fastapi.routing
+
+# Starlette
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Methods labelled by name; anything else a client sends is "other", so
+# arbitrary verbs cannot create new series.
+_HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "CONNECT", "TRACE"))
+
+# Seconds spent in pydantic validation by the current request.
+_validation: contextvars.ContextVar = contextvars.ContextVar("validation")
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Series:
+    """Everything recorded for one (method, route, status)."""
+
+    __slots__ = ("duration", "validation", "handler", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.validation = Histogram()
+        self.handler = Histogram()
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+_HISTOGRAMS = (
+    ("http_request_duration_seconds", "duration", "Time from request start to the last response byte."),
+    ("http_validation_duration_seconds", "validation", "Time spent in pydantic request and response validation."),
+    ("http_handler_duration_seconds", "handler", "Request time outside pydantic validation."),
+)
+_COUNTERS = (
+    ("http_request_bytes_total", "request_bytes", "Request body bytes received."),
+    ("http_response_bytes_total", "response_bytes", "Response body bytes sent."),
+)
+
+
+class Metrics:
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str, int], Series] = {}
+
+    def get(self, method: str, route: str, status: int) -> Series:
+        key = (method, route, status)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = Series()
+        return series
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format."""
+        lines = []
+        items = sorted(self.series.items())
+        for name, attribute, description in _HISTOGRAMS:
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} histogram".format(name))
+            for (method, route, status), series in items:
+                histogram = getattr(series, attribute)
+                labels = 'method="{}",route="{}",status="{}"'.format(method, _escape(route), status)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, cumulative))
+                lines.append("{}_sum{{{}}} {}".format(name, labels, histogram.total))
+                lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+        for name, attribute, description in _COUNTERS:
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} counter".format(name))
+            for (method, route, status), series in items:
+                labels = 'method="{}",route="{}",status="{}"'.format(method, _escape(route), status)
+                lines.append("{}{{{}}} {}".format(name, labels, getattr(series, attribute)))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def instrument_validation() -> None:
+    """Time FastAPI's parameter, body and response validation into the current request's metrics.
+
+    Only the validation steps are wrapped, not dependency resolution as a
+    whole, so dependencies such as authentication count as handler time.
+    """
+
+    def timed(function):
+        def wrapper(*args, **kwargs):
+            cell = _validation.get(None)
+            if cell is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                cell[0] += time.perf_counter() - started
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def timed_async(function):
+        async def wrapper(*args, **kwargs):
+            cell = _validation.get(None)
+            if cell is None:
+                return await function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                cell[0] += time.perf_counter() - started
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    utils = fastapi.dependencies.utils
+    if not hasattr(utils.request_params_to_args, "__wrapped__"):
+        utils.request_params_to_args = timed(utils.request_params_to_args)
+        utils.request_body_to_args = timed_async(utils.request_body_to_args)
+        fastapi.routing.serialize_response = timed_async(fastapi.routing.serialize_response)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, validation time and body sizes per route.
+
+    Routes are labelled by their path template, requests that match no
+    route share the "unmatched" label and non-standard methods share "other".
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics, profiler: Optional["SamplingProfiler"] = None):
+        self.app = app
+        self.metrics = metrics
+        self.profiler = profiler
+        self._routes: Dict[object, str] = {}
+
+    def _route(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            for candidate in scope["app"].routes:
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = "unmatched"
+            self._routes[endpoint] = route
+        return route
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sizes = [0, 0]
+        status = [500]
+
+        async def counting_receive() -> Message:
+            message = await receive()
+            sizes[0] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            else:
+                sizes[1] += len(message.get("body", b""))
+            await send(message)
+
+        cell = [0.0]
+        token = _validation.set(cell)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            finished = time.perf_counter()
+            _validation.reset(token)
+            elapsed = finished - started
+            route = self._route(scope)
+            method = scope["method"] if scope["method"] in _HTTP_METHODS else "other"
+            series = self.metrics.get(method, route, status[0])
+            series.duration.observe(elapsed)
+            series.validation.observe(cell[0])
+            series.handler.observe(elapsed - cell[0])
+            series.request_bytes += sizes[0]
+            series.response_bytes += sizes[1]
+            profiler = self.profiler
+            if profiler is not None and profiler.running:
+                profiler.request_done("{} {}".format(method, route), started, finished)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack while running and keeps the slowest requests.
+
+    A background thread records the collapsed stack of each thread every
+    interval seconds. When a request finishes and is among the slowest
+    keep requests seen since start(), the samples taken while it ran are
+    aggregated and kept. Concurrent requests share samples, so a profile
+    shows what the process was doing during the request.
+    """
+
+    def __init__(self, interval: float = 0.005, keep: int = 10, history: int = 20_000):
+        self.interval = interval
+        self.keep = keep
+        self._samples: Deque[Tuple[float, str]] = deque(maxlen=history)
+        self._slowest: List[Tuple[float, int, str, Counter]] = []
+        self._sequence = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.running = False
+
+    def start(self, interval: Optional[float] = None) -> None:
+        if self.running:
+            return
+        if interval is not None:
+            self.interval = interval
+        self._samples.clear()
+        self._slowest = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        self.running = True
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_name))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._samples.append((now, ";".join(reversed(stack))))
+
+    def request_done(self, label: str, started: float, finished: float) -> None:
+        elapsed = finished - started
+        if len(self._slowest) >= self.keep and elapsed <= self._slowest[0][0]:
+            return
+        stacks = Counter(stack for moment, stack in tuple(self._samples) if started <= moment <= finished)
+        self._sequence += 1
+        entry = (elapsed, self._sequence, label, stacks)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heapreplace(self._slowest, entry)
+
+    def dump(self) -> str:
+        """Collapsed stacks of the slowest requests, slowest first."""
+        lines = []
+        for elapsed, _, label, stacks in sorted(self._slowest, reverse=True):
+            lines.append("# {} {:.6f}s".format(label, elapsed))
+            lines.extend("{} {}".format(stack, count) for stack, count in stacks.most_common())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,321 @@
+# Python
+import base64
+import heapq
+import os
+import pickle
+import re
+import struct
+from bisect import bisect_right, insort
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+_TOKEN = re.compile(r"([#@]?)(\w+)")
+_CURSOR = struct.Struct(">q")
+_BLOCK = 128
+_SNAPSHOT_VERSION = 2
+# Unix microseconds of 0001-01-01, so docids for any datetime are positive
+# and the varint gaps between them never go negative.
+_DOCID_ORIGIN = -62_135_596_800_000_000
+
+
+def tokenize(content: str) -> Set[str]:
+    """Lowercased words, plus "#tag" and "@name" terms for hashtags and mentions.
+
+    A hashtag or mention is also indexed as a plain word, so "python"
+    matches "#python" but "#python" only matches the hashtag.
+    """
+    terms = set()
+    for prefix, word in _TOKEN.findall(content.lower()):
+        terms.add(word)
+        if prefix:
+            terms.add(prefix + word)
+    return terms
+
+
+def encode_cursor(docid: int) -> str:
+    return base64.urlsafe_b64encode(_CURSOR.pack(docid)).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Raise ValueError when the cursor was not produced by encode_cursor."""
+    try:
+        return _CURSOR.unpack(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))[0]
+    except (ValueError, struct.error) as error:
+        raise ValueError("invalid cursor") from error
+
+
+# Posting lists
+
+def _pack(docids: List[int]) -> bytes:
+    """Varint encode the gaps of an ascending list; the first gap is from 0."""
+    out = bytearray()
+    previous = 0
+    for docid in docids:
+        gap = docid - previous
+        previous = docid
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return bytes(out)
+
+
+def _unpack(block: bytes) -> List[int]:
+    docids = []
+    docid = gap = shift = 0
+    for byte in block:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        docid += gap
+        docids.append(docid)
+        gap = shift = 0
+    return docids
+
+
+class PostingList:
+    """Ascending docids split into delta-compressed blocks.
+
+    firsts and lasts hold the bounds of every block, so readers can skip
+    whole blocks without decoding them.
+    """
+
+    __slots__ = ("firsts", "lasts", "counts", "blocks", "size")
+
+    def __init__(self):
+        self.firsts: List[int] = []
+        self.lasts: List[int] = []
+        self.counts: List[int] = []
+        self.blocks: List[bytes] = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _store(self, index: int, docids: List[int]) -> None:
+        self.firsts[index] = docids[0]
+        self.lasts[index] = docids[-1]
+        self.counts[index] = len(docids)
+        self.blocks[index] = _pack(docids)
+
+    def add(self, docid: int) -> None:
+        index = max(bisect_right(self.firsts, docid) - 1, 0)
+        self.size += 1
+        if not self.blocks or (index == len(self.blocks) - 1 and docid > self.lasts[index]
+                               and self.counts[index] >= _BLOCK):
+            self.firsts.append(docid)
+            self.lasts.append(docid)
+            self.counts.append(1)
+            self.blocks.append(_pack([docid]))
+            return
+        docids = _unpack(self.blocks[index])
+        insort(docids, docid)
+        if len(docids) > _BLOCK:
+            half = len(docids) // 2
+            for bounds in (self.firsts, self.lasts, self.counts):
+                bounds.insert(index + 1, 0)
+            self.blocks.insert(index + 1, b"")
+            self._store(index + 1, docids[half:])
+            docids = docids[:half]
+        self._store(index, docids)
+
+    def remove(self, docid: int) -> None:
+        index = bisect_right(self.firsts, docid) - 1
+        if index < 0 or docid > self.lasts[index]:
+            return
+        docids = _unpack(self.blocks[index])
+        if docid not in docids:
+            return
+        docids.remove(docid)
+        self.size -= 1
+        if docids:
+            self._store(index, docids)
+        else:
+            del self.firsts[index], self.lasts[index], self.counts[index], self.blocks[index]
+
+    def reader(self) -> "_Reader":
+        return _Reader(self)
+
+
+class _Reader:
+    """Walks a posting list from newest to oldest."""
+
+    __slots__ = ("_postings", "_block", "_docids", "_position")
+
+    def __init__(self, postings: PostingList):
+        self._postings = postings
+        self._block = len(postings.blocks)
+        self._docids: List[int] = []
+        self._position = -1
+
+    def seek(self, target: int) -> Optional[int]:
+        """Move to the newest docid not above target and return it, or None."""
+        if self._position >= 0 and self._docids[self._position] <= target:
+            return self._docids[self._position]
+        postings = self._postings
+        block = min(bisect_right(postings.firsts, target), self._block + 1) - 1
+        if block < 0:
+            self._position = -1
+            return None
+        if block != self._block:
+            self._block = block
+            self._docids = _unpack(postings.blocks[block])
+        self._position = bisect_right(self._docids, target) - 1
+        return self._docids[self._position]
+
+
+def _intersect(readers: List[_Reader], before: int) -> Iterator[int]:
+    """Yield docids present in every reader, newest first, below before."""
+    target = before - 1
+    while True:
+        for reader in readers:
+            docid = reader.seek(target)
+            if docid is None:
+                return
+            if docid < target:
+                target = docid
+                break
+        else:
+            yield target
+            target -= 1
+
+
+# Index
+
+class SearchIndex:
+    """Inverted index from terms to tweets, kept in recency order.
+
+    Documents are identified by their creation time in microseconds since
+    0001-01-01, bumped on collision, so ascending docids are chronological
+    and the newest matches can be read first.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, PostingList] = {}
+        self._tweet_ids: Dict[int, bytes] = {}
+        self._docids: Dict[bytes, int] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._docids)
+
+    def add(self, tweet_id: UUID, created: int, content: str) -> None:
+        """Index a new tweet; created is its creation time in Unix microseconds."""
+        key = tweet_id.bytes
+        terms = tokenize(content)
+        with self._lock:
+            if key in self._docids:
+                return
+            docid = max(created - _DOCID_ORIGIN, 0)
+            while docid in self._tweet_ids:
+                docid += 1
+            self._tweet_ids[docid] = key
+            self._docids[key] = docid
+            self._add_terms(docid, terms)
+
+    def remove(self, tweet_id: UUID, content: str) -> None:
+        terms = tokenize(content)
+        with self._lock:
+            docid = self._docids.pop(tweet_id.bytes, None)
+            if docid is None:
+                return
+            del self._tweet_ids[docid]
+            self._remove_terms(docid, terms)
+
+    def update(self, tweet_id: UUID, old_content: str, new_content: str) -> None:
+        old_terms, new_terms = tokenize(old_content), tokenize(new_content)
+        with self._lock:
+            docid = self._docids.get(tweet_id.bytes)
+            if docid is None:
+                return
+            self._remove_terms(docid, old_terms - new_terms)
+            self._add_terms(docid, new_terms - old_terms)
+
+    def _add_terms(self, docid: int, terms: Iterable[str]) -> None:
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = PostingList()
+            postings.add(docid)
+
+    def _remove_terms(self, docid: int, terms: Iterable[str]) -> None:
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.remove(docid)
+                if not postings:
+                    del self._postings[term]
+
+    def _clause(self, terms: Set[str], before: int) -> Iterator[int]:
+        postings = [self._postings.get(term) for term in terms]
+        if not postings or None in postings:
+            return iter(())
+        # Drive the intersection from the rarest term.
+        postings.sort(key=len)
+        return _intersect([p.reader() for p in postings], before)
+
+    def search(self, query: str, limit: int, before: Optional[int] = None) -> Tuple[List[UUID], Optional[int]]:
+        """Newest tweets matching query, older than the before docid.
+
+        Whitespace separated terms must all match; "OR" separates
+        alternatives. Returns the page and the cursor for the next one.
+        """
+        if before is None:
+            before = 2 ** 63 - 1
+        clauses: List[Set[str]] = []
+        terms: Set[str] = set()
+        for word in query.split() + ["OR"]:
+            if word == "OR":
+                if terms:
+                    clauses.append(terms)
+                terms = set()
+            else:
+                terms |= tokenize(word)
+
+        with self._lock:
+            matches = [self._clause(terms, before) for terms in clauses]
+            page: List[int] = []
+            previous = None
+            for docid in heapq.merge(*matches, reverse=True):
+                if docid == previous:
+                    continue
+                if len(page) == limit:
+                    return [UUID(bytes=self._tweet_ids[d]) for d in page], page[-1]
+                page.append(docid)
+                previous = docid
+            return [UUID(bytes=self._tweet_ids[d]) for d in page], None
+
+    # Snapshots
+
+    def save(self, path: str) -> None:
+        """Write the index atomically to path."""
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as snapshot, self._lock:
+            state = {
+                "version": _SNAPSHOT_VERSION,
+                "postings": {
+                    term: (p.firsts, p.lasts, p.counts, p.blocks, p.size)
+                    for term, p in self._postings.items()
+                },
+                "tweet_ids": self._tweet_ids
+            }
+            pickle.dump(state, snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        with open(path, "rb") as snapshot:
+            state = pickle.load(snapshot)
+        if state.get("version") != _SNAPSHOT_VERSION:
+            raise ValueError("unsupported search snapshot version")
+        index = cls()
+        for term, fields in state["postings"].items():
+            postings = index._postings[term] = PostingList()
+            postings.firsts, postings.lasts, postings.counts, postings.blocks, postings.size = fields
+        index._tweet_ids = state["tweet_ids"]
+        index._docids = {key: docid for docid, key in index._tweet_ids.items()}
+        return index
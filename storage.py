@@ -0,0 +1,506 @@
+# Python
+import abc
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+from uuid import UUID
+
+Buffer = Union[bytes, memoryview]
+
+# Records
+
+PUT = 1
+DELETE = 2
+
+# crc32, payload length, kind, tweet_id
+_HEADER = struct.Struct("<IIB16s")
+# create_at, update_at, content length
+_TWEET = struct.Struct("<qqH")
+_NO_UPDATE = -(2 ** 63)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class TweetRecord(NamedTuple):
+    tweet_id: UUID
+    content: str
+    create_at: datetime
+    update_at: Optional[datetime]
+    author: bytes
+
+
+# Times
+
+# Every timestamp is UTC: naive datetimes are taken to be UTC already, and
+# times read back are timezone aware.
+
+def as_utc(moment: datetime) -> datetime:
+    """moment as an aware UTC datetime; raises OverflowError when it falls outside the calendar."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def to_micros(moment: datetime) -> int:
+    """Microseconds since the Unix epoch."""
+    delta = as_utc(moment) - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(micros: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def encode_tweet(
+    content: str,
+    create_at: datetime,
+    update_at: Optional[datetime],
+    author: bytes
+) -> bytes:
+    """Encode a tweet payload; timestamps are stored as UTC microseconds."""
+    text = content.encode("utf-8")
+    head = _TWEET.pack(
+        to_micros(create_at),
+        _NO_UPDATE if update_at is None else to_micros(update_at),
+        len(text)
+    )
+    return b"".join((head, text, author))
+
+
+def decode_tweet(tweet_id: UUID, payload: Buffer) -> TweetRecord:
+    create_at, update_at, length = _TWEET.unpack_from(payload)
+    start = _TWEET.size
+    return TweetRecord(
+        tweet_id=tweet_id,
+        content=str(payload[start:start + length], "utf-8"),
+        create_at=from_micros(create_at),
+        update_at=None if update_at == _NO_UPDATE else from_micros(update_at),
+        author=bytes(payload[start + length:])
+    )
+
+
+# Stores
+
+class TweetStore(abc.ABC):
+    """Interface shared by the storage backends.
+
+    Writes are group committed: put_many() and delete() return once the
+    write has been synced to disk, and writers that arrive while a sync is
+    running share the next one.
+    """
+
+    def put(self, tweet_id: UUID, payload: bytes) -> None:
+        self.put_many([(tweet_id, payload)])
+
+    def add(self, tweet_id: UUID, payload: bytes) -> bool:
+        """Store the tweet unless tweet_id is taken; whether it was stored."""
+        return bool(self.add_many([(tweet_id, payload)]))
+
+    @abc.abstractmethod
+    def put_many(self, records: List[Tuple[UUID, bytes]]) -> None:
+        pass
+
+    @abc.abstractmethod
+    def add_many(self, records: List[Tuple[UUID, bytes]]) -> List[UUID]:
+        """Store each record whose tweet_id is free, atomically; the ids stored."""
+
+    @abc.abstractmethod
+    def replace(self, tweet_id: UUID, payload: bytes) -> Optional[bytes]:
+        """Overwrite an existing tweet atomically; its previous payload, or None if there is none."""
+
+    @abc.abstractmethod
+    def get(self, tweet_id: UUID) -> Optional[Buffer]:
+        pass
+
+    @abc.abstractmethod
+    def delete(self, tweet_id: UUID) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def scan(self) -> Iterator[Tuple[UUID, Buffer]]:
+        pass
+
+    @abc.abstractmethod
+    def sync(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def __contains__(self, tweet_id: UUID) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class _GroupCommit:
+    """Background thread syncing the store on behalf of waiting writers.
+
+    Each write takes a ticket while it holds the store's lock; the thread
+    syncs whenever tickets are outstanding, waiting linger seconds first to
+    gather more, and wakes every writer the sync covered. A failed sync is
+    raised to every writer from then on.
+    """
+
+    def __init__(self, store: TweetStore, linger: float):
+        self._store = store
+        self._linger = linger
+        self._changed = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="tweet-store-sync", daemon=True)
+        self._thread.start()
+
+    def ticket(self) -> int:
+        """Register a write; call with the store's lock held, after writing."""
+        with self._changed:
+            self._written += 1
+            self._changed.notify_all()
+            return self._written
+
+    def wait(self, ticket: int) -> None:
+        """Block until the write holding ticket has been synced."""
+        with self._changed:
+            while self._synced < ticket and self._error is None:
+                self._changed.wait()
+            if self._error is not None:
+                raise OSError("tweet store sync failed") from self._error
+
+    def _run(self) -> None:
+        while True:
+            with self._changed:
+                while self._synced == self._written and not self._closed:
+                    self._changed.wait()
+                if self._synced == self._written:
+                    return
+            if self._linger:
+                time.sleep(self._linger)
+            with self._changed:
+                target = self._written
+            try:
+                self._store.sync()
+            except Exception as error:
+                with self._changed:
+                    self._error = error
+                    self._changed.notify_all()
+                return
+            with self._changed:
+                self._synced = target
+                self._changed.notify_all()
+
+    def stop(self) -> None:
+        """Sync what is outstanding and stop the thread."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._thread.join()
+
+
+class LogStore(TweetStore):
+    """Append-only log of records split into preallocated, memory-mapped segments.
+
+    The index maps each live tweet_id to the location of its latest record,
+    so get() returns a memoryview straight into the mapping. Updates append a
+    new record and deletes append a tombstone. Every record carries a CRC;
+    on open the log is scanned header by header to rebuild the index, and
+    anything after the first torn record of a segment is discarded.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 64 * 1024 * 1024,
+        sync_linger: float = 0.0
+    ):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._files: List[int] = []
+        self._maps: List[mmap.mmap] = []
+        self._index = {}
+        self._offset = 0
+        self._dirty_from: Optional[Tuple[int, int]] = None
+        os.makedirs(directory, exist_ok=True)
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".log"))
+        for name in names:
+            self._map_segment(os.path.join(directory, name))
+            self._offset = self._recover(len(self._maps) - 1)
+        if not self._maps:
+            self._new_segment()
+        self._committer = _GroupCommit(self, sync_linger)
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, "segment-{:06d}.log".format(number))
+
+    def _map_segment(self, path: str) -> None:
+        fd = os.open(path, os.O_RDWR)
+        self._files.append(fd)
+        self._maps.append(mmap.mmap(fd, 0))
+
+    def _new_segment(self) -> None:
+        path = self._segment_path(len(self._maps))
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            os.ftruncate(fd, self.segment_size)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self._map_segment(path)
+        self._offset = 0
+
+    def _recover(self, segment: int) -> int:
+        mapping = self._maps[segment]
+        size = len(mapping)
+        offset = 0
+        torn = False
+        with memoryview(mapping) as view:
+            while offset + _HEADER.size <= size:
+                crc, length, kind, key = _HEADER.unpack_from(view, offset)
+                if kind == 0 and crc == 0:
+                    break
+                end = offset + _HEADER.size + length
+                if end > size or zlib.crc32(view[offset + 4:end]) != crc:
+                    torn = True
+                    break
+                if kind == PUT:
+                    self._index[key] = (segment << 64) | (offset << 32) | length
+                else:
+                    self._index.pop(key, None)
+                offset = end
+        if torn:
+            mapping[offset:] = bytes(size - offset)
+            mapping.flush()
+        return offset
+
+    def _append(self, kind: int, key: bytes, payload: bytes) -> int:
+        size = _HEADER.size + len(payload)
+        if size > self.segment_size:
+            raise ValueError("record larger than a segment")
+        if self._offset + size > self.segment_size:
+            self._new_segment()
+        segment, offset = len(self._maps) - 1, self._offset
+        header = _HEADER.pack(0, len(payload), kind, key)
+        crc = zlib.crc32(payload, zlib.crc32(memoryview(header)[4:]))
+        view = self._maps[segment]
+        _HEADER.pack_into(view, offset, crc, len(payload), kind, key)
+        view[offset + _HEADER.size:offset + size] = payload
+        if self._dirty_from is None:
+            self._dirty_from = (segment, offset)
+        self._offset = offset + size
+        return (segment << 64) | (offset << 32) | len(payload)
+
+    def put_many(self, records: List[Tuple[UUID, bytes]]) -> None:
+        with self._lock:
+            for tweet_id, payload in records:
+                key = tweet_id.bytes
+                self._index[key] = self._append(PUT, key, payload)
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+
+    def add_many(self, records: List[Tuple[UUID, bytes]]) -> List[UUID]:
+        stored = []
+        with self._lock:
+            for tweet_id, payload in records:
+                key = tweet_id.bytes
+                if key not in self._index:
+                    self._index[key] = self._append(PUT, key, payload)
+                    stored.append(tweet_id)
+            if not stored:
+                return stored
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+        return stored
+
+    def replace(self, tweet_id: UUID, payload: bytes) -> Optional[bytes]:
+        key = tweet_id.bytes
+        with self._lock:
+            previous = self.get(tweet_id)
+            if previous is None:
+                return None
+            previous = bytes(previous)
+            self._index[key] = self._append(PUT, key, payload)
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+        return previous
+
+    def get(self, tweet_id: UUID) -> Optional[memoryview]:
+        location = self._index.get(tweet_id.bytes)
+        if location is None:
+            return None
+        start = ((location >> 32) & 0xFFFFFFFF) + _HEADER.size
+        return memoryview(self._maps[location >> 64])[start:start + (location & 0xFFFFFFFF)]
+
+    def delete(self, tweet_id: UUID) -> bool:
+        key = tweet_id.bytes
+        with self._lock:
+            if self._index.pop(key, None) is None:
+                return False
+            self._append(DELETE, key, b"")
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+        return True
+
+    def scan(self) -> Iterator[Tuple[UUID, memoryview]]:
+        for key in list(self._index):
+            tweet_id = UUID(bytes=key)
+            payload = self.get(tweet_id)
+            if payload is not None:
+                yield tweet_id, payload
+
+    def _sync_locked(self) -> None:
+        if self._dirty_from is None:
+            return
+        first, offset = self._dirty_from
+        for segment in range(first, len(self._maps)):
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY if segment == first else 0
+            end = self._offset if segment == len(self._maps) - 1 else self.segment_size
+            self._maps[segment].flush(start, end - start)
+        self._dirty_from = None
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync_locked()
+
+    def close(self) -> None:
+        self._committer.stop()
+        self.sync()
+        for view in self._maps:
+            view.close()
+        for fd in self._files:
+            os.close(fd)
+        self._maps, self._files = [], []
+
+    def __contains__(self, tweet_id: UUID) -> bool:
+        return tweet_id.bytes in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class SQLiteStore(TweetStore):
+    """The same interface over a SQLite database in WAL mode.
+
+    Writes go into one open transaction that is committed in groups, with
+    the WAL fsynced on every commit; reads return copies rather than views.
+    """
+
+    def __init__(self, path: str, sync_linger: float = 0.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level="DEFERRED")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tweets (tweet_id BLOB PRIMARY KEY, payload BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._committer = _GroupCommit(self, sync_linger)
+
+    def put_many(self, records: List[Tuple[UUID, bytes]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO tweets (tweet_id, payload) VALUES (?, ?)",
+                [(tweet_id.bytes, payload) for tweet_id, payload in records]
+            )
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+
+    def add_many(self, records: List[Tuple[UUID, bytes]]) -> List[UUID]:
+        stored = []
+        with self._lock:
+            for tweet_id, payload in records:
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO tweets (tweet_id, payload) VALUES (?, ?)",
+                    (tweet_id.bytes, payload)
+                ).rowcount
+                if inserted:
+                    stored.append(tweet_id)
+            if not stored:
+                return stored
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+        return stored
+
+    def replace(self, tweet_id: UUID, payload: bytes) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM tweets WHERE tweet_id = ?", (tweet_id.bytes,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE tweets SET payload = ? WHERE tweet_id = ?", (payload, tweet_id.bytes))
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+        return row[0]
+
+    def get(self, tweet_id: UUID) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM tweets WHERE tweet_id = ?", (tweet_id.bytes,)).fetchone()
+        return None if row is None else row[0]
+
+    def delete(self, tweet_id: UUID) -> bool:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM tweets WHERE tweet_id = ?", (tweet_id.bytes,)).rowcount
+            if not deleted:
+                return False
+            ticket = self._committer.ticket()
+        self._committer.wait(ticket)
+        return True
+
+    def scan(self) -> Iterator[Tuple[UUID, bytes]]:
+        last = b""
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT tweet_id, payload FROM tweets WHERE tweet_id > ? ORDER BY tweet_id LIMIT 1000",
+                    (last,)
+                ).fetchall()
+            if not rows:
+                return
+            for key, payload in rows:
+                yield UUID(bytes=key), payload
+            last = rows[-1][0]
+
+    def sync(self) -> None:
+        with self._lock:
+            self._db.commit()
+
+    def close(self) -> None:
+        self._committer.stop()
+        self.sync()
+        self._db.close()
+
+    def __contains__(self, tweet_id: UUID) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM tweets WHERE tweet_id = ?", (tweet_id.bytes,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+
+def open_store(url: str) -> TweetStore:
+    """Open a store from a "log:<directory>" or "sqlite:<file>" url."""
+    scheme, _, path = url.partition(":")
+    if scheme == "log":
+        return LogStore(path)
+    if scheme == "sqlite":
+        return SQLiteStore(path)
+    raise ValueError("unknown store url: {}".format(url))
@@ -0,0 +1,195 @@
+# Python
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Set
+from uuid import UUID
+
+# Timeline
+from timeline import FollowGraph
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+
+class Frame:
+    """One published tweet, encoded once and shared by every subscriber.
+
+    The encoding is deferred to the first subscriber that reads it, so a
+    tweet nobody is watching is never rendered.
+    """
+
+    __slots__ = ("tweet_id", "author_id", "_render", "_data", "_text", "_event")
+
+    def __init__(self, tweet_id: UUID, author_id: UUID, render: Callable[[], bytes]):
+        self.tweet_id = tweet_id
+        self.author_id = author_id
+        self._render: Optional[Callable[[], bytes]] = render
+        self._data: Optional[bytes] = None
+        self._text: Optional[str] = None
+        self._event: Optional[bytes] = None
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = self._render()
+            self._render = None
+        return self._data
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.data.decode()
+        return self._text
+
+    @property
+    def event(self) -> bytes:
+        """The frame as a Server-Sent Event."""
+        if self._event is None:
+            self._event = b"".join((b"id: ", str(self.tweet_id).encode(), b"\ndata: ", self.data, b"\n\n"))
+        return self._event
+
+
+class Subscriber:
+    """A bounded queue of frames for one connection.
+
+    Nothing is allocated while the connection is idle apart from the
+    empty deque; a future is only created while a reader is waiting.
+    """
+
+    __slots__ = ("user_id", "capacity", "policy", "dropped", "closed", "_frames", "_waiter")
+
+    def __init__(self, user_id: Optional[UUID], capacity: int, policy: str):
+        self.user_id = user_id
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._frames: Deque[Frame] = deque()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def push(self, frame: Frame) -> None:
+        if self.closed:
+            return
+        if len(self._frames) >= self.capacity:
+            if self.policy == DISCONNECT:
+                self.close()
+                return
+            self._frames.popleft()
+            self.dropped += 1
+        self._frames.append(frame)
+        self._wake()
+
+    def close(self) -> None:
+        self.closed = True
+        self._frames.clear()
+        self._wake()
+
+    def _wake(self) -> None:
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Frame]:
+        """Next frame; None once closed. Raises asyncio.TimeoutError after timeout."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            finally:
+                self._waiter = None
+        return self._frames.popleft()
+
+
+class FanoutHub:
+    """Delivers new tweets to live subscribers.
+
+    Subscribers either follow the global stream or a user's home stream,
+    which carries tweets by the user and by everyone they follow. The last
+    replay_size frames are kept so a reconnecting client can resume after
+    the last tweet_id it saw; if that id has already left the buffer the
+    whole buffer is replayed. A replay never holds more than the queue
+    capacity: older missed frames are counted as dropped rather than
+    triggering the slow consumer policy.
+
+    publish() may be called from any thread; delivery always happens on
+    the event loop the subscribers live on.
+    """
+
+    def __init__(
+        self,
+        graph: FollowGraph,
+        capacity: int = 256,
+        policy: str = DROP_OLDEST,
+        replay_size: int = 1024
+    ):
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError("unknown slow consumer policy: {}".format(policy))
+        self.graph = graph
+        self.capacity = capacity
+        self.policy = policy
+        self._replay: Deque[Frame] = deque(maxlen=replay_size)
+        self._global: Set[Subscriber] = set()
+        self._users: Dict[UUID, Set[Subscriber]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._global) + sum(map(len, self._users.values()))
+
+    def subscribe(self, user_id: Optional[UUID] = None, last_id: Optional[UUID] = None) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(user_id, self.capacity, self.policy)
+        if last_id is not None:
+            missed = [
+                frame for frame in self._missed(last_id)
+                if user_id is None or self._reaches(frame.author_id, user_id)
+            ]
+            subscriber.dropped = max(0, len(missed) - self.capacity)
+            for frame in missed[subscriber.dropped:]:
+                subscriber.push(frame)
+        if user_id is None:
+            self._global.add(subscriber)
+        else:
+            self._users.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscriber.close()
+        if subscriber.user_id is None:
+            self._global.discard(subscriber)
+            return
+        subscribers = self._users.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._users[subscriber.user_id]
+
+    def _missed(self, last_id: UUID) -> Iterable[Frame]:
+        frames = list(self._replay)
+        for position in range(len(frames) - 1, -1, -1):
+            if frames[position].tweet_id == last_id:
+                return frames[position + 1:]
+        return frames
+
+    def _reaches(self, author_id: UUID, user_id: UUID) -> bool:
+        return author_id == user_id or self.graph.follows(user_id, author_id)
+
+    def publish(self, frame: Frame) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._replay.append(frame)
+            return
+        loop.call_soon_threadsafe(self._deliver, frame)
+
+    def _deliver(self, frame: Frame) -> None:
+        self._replay.append(frame)
+        for subscriber in tuple(self._global):
+            subscriber.push(frame)
+        if not self._users:
+            return
+        audience = self.graph.followers_among(frame.author_id, self._users)
+        audience.append(frame.author_id)
+        for user_id in audience:
+            for subscriber in tuple(self._users.get(user_id, ())):
+                subscriber.push(frame)
@@ -0,0 +1,6 @@
+# Python
+import os
+import sys
+
+# The modules under test live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,119 @@
+# Python
+import asyncio
+import json
+import os
+from collections import Counter
+from uuid import uuid4
+
+# Pytest
+import pytest
+
+# Auth
+from auth import AttemptLimiter, SessionTokens
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    """The app, with its stores in a temporary directory."""
+    directory = tmp_path_factory.mktemp("app")
+    previous = dict(os.environ)
+    os.environ.update({
+        "TWEET_STORE": "log:" + str(directory / "tweets"),
+        "SEARCH_SNAPSHOT": str(directory / "search.snapshot"),
+        "INGEST_TOKEN": "ingest",
+    })
+    try:
+        import main
+        from bench.load import ASGIClient
+    finally:
+        os.environ.clear()
+        os.environ.update(previous)
+    yield main, ASGIClient(main.app)
+    main.hasher.close()
+
+
+def request(client, method, path, body, token=None):
+    headers = {"content-type": "application/json"}
+    if token:
+        headers["authorization"] = "Bearer " + token
+    return client.request(method, path, headers=headers, body=json.dumps(body).encode())
+
+
+def registration(email):
+    return {
+        "user_id": str(uuid4()), "email": email, "password": "correct horse",
+        "first_name": "Some", "last_name": "One"
+    }
+
+
+def test_limiter_blocks_after_burst_and_refunds():
+    limiter = AttemptLimiter(burst=3, period=60)
+    assert [limiter.attempt("key") for _ in range(4)] == [True, True, True, False]
+    limiter.refund("key")
+    assert limiter.attempt("key")
+    assert not limiter.attempt("key")
+    limiter.succeeded("key")
+    assert limiter.attempt("key")
+    assert limiter.attempt("other")
+
+
+def test_session_tokens():
+    tokens = SessionTokens(b"secret")
+    user_id = uuid4()
+    token = tokens.issue(user_id)
+    assert tokens.verify(token) == user_id
+    assert SessionTokens(b"other secret").verify(token) is None
+    assert tokens.verify("garbage") is None
+
+
+def test_repeated_signup_keeps_the_account(app):
+    main, client = app
+    user = registration("double@example.com")
+
+    async def run():
+        responses = await asyncio.gather(*(request(client, "POST", "/signup", user) for _ in range(2)))
+        login = await request(client, "POST", "/login", dict(user, first_name=None, last_name=None))
+        return sorted(status for status, _ in responses), login[0]
+
+    statuses, login = asyncio.run(run())
+    assert statuses == [201, 409]
+    assert main.emails["double@example.com"] == main.UUID(user["user_id"])
+    assert login == 200
+
+
+def test_failed_hash_releases_the_email(app, monkeypatch):
+    main, client = app
+
+    async def broken(password):
+        raise RuntimeError("pool is gone")
+
+    monkeypatch.setattr(main.hasher, "hash", broken)
+    with pytest.raises(RuntimeError):
+        asyncio.run(request(client, "POST", "/signup", registration("broken@example.com")))
+    assert "broken@example.com" not in main.emails
+
+
+def test_concurrent_wrong_passwords_are_throttled(app):
+    main, client = app
+    user = registration("guessed@example.com")
+    guess = {"user_id": user["user_id"], "email": user["email"], "password": "wrong password"}
+
+    async def run():
+        await request(client, "POST", "/signup", user)
+        responses = await asyncio.gather(*(request(client, "POST", "/login", guess) for _ in range(20)))
+        return Counter(status for status, _ in responses)
+
+    assert asyncio.run(run()) == {401: main.login_attempts.burst, 429: 20 - main.login_attempts.burst}
+
+
+def test_creating_profiles_needs_the_ingest_token(app):
+    main, client = app
+    profile = {"user_id": str(uuid4()), "email": "imported@example.com", "first_name": "Im", "last_name": "Ported"}
+
+    async def run():
+        anonymous = await request(client, "POST", "/users", profile)
+        created = await request(client, "POST", "/users", profile, token="ingest")
+        again = await request(client, "POST", "/users", profile, token="ingest")
+        return anonymous[0], created[0], again[0]
+
+    assert asyncio.run(run()) == (401, 201, 409)
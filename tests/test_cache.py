@@ -0,0 +1,101 @@
+# Python
+import asyncio
+import threading
+
+# Cache
+from cache import ResponseCache, etag_matches
+
+
+def loader(body, stamp=1, tags=()):
+    return lambda: (body, stamp, tags)
+
+
+def get(cache, key, load):
+    return asyncio.run(cache.get(key, load))
+
+
+def test_etag_matches():
+    assert etag_matches('"a-1"', '"a-1"')
+    assert etag_matches('W/"a-1", "b-2"', '"a-1"')
+    assert etag_matches("*", '"a-1"')
+    assert not etag_matches('"a-2"', '"a-1"')
+    assert not etag_matches(None, '"a-1"')
+    assert not etag_matches('"a-1"', None)
+
+
+def test_unrelated_invalidation_keeps_the_etag():
+    cache = ResponseCache()
+    first = get(cache, "tweet:a", loader(b"a", tags=("user:1",)))
+    cache.invalidate("tweet:b")
+    cache.invalidate("user:2")
+    assert cache.peek("tweet:a") == first
+    cache.invalidate("tweet:a")
+    assert cache.peek("tweet:a") is None
+    # Even with the same content timestamp, a reload never repeats the old ETag.
+    assert get(cache, "tweet:a", loader(b"a", tags=("user:1",))).etag != first.etag
+
+
+def test_tag_invalidation_changes_the_etag():
+    cache = ResponseCache()
+    first = get(cache, "tweet:a", loader(b"a", tags=("user:1",)))
+    cache.invalidate("user:1")
+    assert cache.peek("tweet:a") is None
+    second = get(cache, "tweet:a", loader(b"a", tags=("user:1",)))
+    assert first.etag and second.etag and second.etag != first.etag
+
+
+def test_load_overlapping_an_invalidation_is_not_cached():
+    cache = ResponseCache()
+
+    def stale():
+        cache.invalidate("user:1")
+        return b"stale", 1, ("user:1",)
+
+    entry = get(cache, "tweet:a", stale)
+    assert entry.body == b"stale" and entry.etag is None
+    assert cache.peek("tweet:a") is None
+    assert get(cache, "tweet:a", loader(b"fresh", tags=("user:1",))).etag is not None
+
+
+def test_forgotten_versions_never_go_backwards():
+    cache = ResponseCache(max_versions=2)
+    etags = []
+    for number in range(6):
+        cache.invalidate("tag:{}".format(number))
+        etags.append(get(cache, "key:{}".format(number), loader(b"x", tags=("tag:0",))).etag)
+        cache.invalidate("key:{}".format(number))
+    versions = [int(etag.strip('"').split("-")[1], 16) for etag in etags]
+    assert versions == sorted(versions)
+    assert len(cache._versions) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ResponseCache()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return b"body", 1, ()
+
+    async def run():
+        waiting = [asyncio.ensure_future(cache.get("key", slow)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiting)
+
+    entries = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(entry is entries[0] for entry in entries)
+
+
+def test_byte_bound_evicts_least_recently_used():
+    cache = ResponseCache(max_bytes=10)
+    get(cache, "a", loader(b"xxxx"))
+    get(cache, "b", loader(b"xxxx"))
+    cache.peek("a")
+    get(cache, "c", loader(b"xxxx"))
+    assert cache.peek("b") is None
+    assert cache.peek("a") is not None and cache.peek("c") is not None
+    assert cache.size == 8
@@ -0,0 +1,34 @@
+# Python
+import asyncio
+
+# Metrics
+from metrics import Metrics, MetricsMiddleware
+
+
+async def plain_text(scope, receive, send):
+    await send({"type": "http.response.start", "status": 405, "headers": []})
+    await send({"type": "http.response.body", "body": b"no"})
+
+
+def call(middleware, method):
+    scope = {"type": "http", "method": method, "path": "/"}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    asyncio.run(middleware(scope, receive, send))
+
+
+def test_unknown_methods_share_one_series():
+    metrics = Metrics()
+    middleware = MetricsMiddleware(plain_text, metrics)
+    for method in ("GET", "POST", "FOO", "BAR", 'X"}\n', "get"):
+        call(middleware, method)
+    assert sorted(metrics.series) == [
+        ("GET", "unmatched", 405), ("POST", "unmatched", 405), ("other", "unmatched", 405)
+    ]
+    assert metrics.series[("other", "unmatched", 405)].duration.count == 4
+    assert "FOO" not in metrics.render()
@@ -0,0 +1,179 @@
+# Python
+import random
+from uuid import UUID
+
+# Pytest
+import pytest
+
+# Search
+import search
+from search import _BLOCK, PostingList, SearchIndex, _unpack, decode_cursor, encode_cursor, tokenize
+
+WORDS = ["api", "python", "cache", "search", "index", "tweet", "#python", "@someone", "latency", "ok"]
+
+
+def docids(postings: PostingList):
+    return [docid for block in postings.blocks for docid in _unpack(block)]
+
+
+def check_blocks(postings: PostingList):
+    assert len(postings.firsts) == len(postings.lasts) == len(postings.counts) == len(postings.blocks)
+    previous = -1
+    for first, last, count, block in zip(postings.firsts, postings.lasts, postings.counts, postings.blocks):
+        block_docids = _unpack(block)
+        assert 0 < count == len(block_docids) <= _BLOCK
+        assert (first, last) == (block_docids[0], block_docids[-1])
+        assert first > previous
+        previous = last
+    assert postings.size == sum(postings.counts)
+
+
+def test_tokenize():
+    assert tokenize("Hello #Python @Someone, hello!") == {
+        "hello", "python", "#python", "someone", "@someone"
+    }
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1_636_020_000_000_000)) == 1_636_020_000_000_000
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_posting_list_appends_split_into_full_blocks():
+    postings = PostingList()
+    for docid in range(1, 1000):
+        postings.add(docid * 1000)
+    check_blocks(postings)
+    assert docids(postings) == [docid * 1000 for docid in range(1, 1000)]
+    # Appends in order fill each block before starting the next.
+    assert postings.counts[:-1] == [_BLOCK] * (len(postings.counts) - 1)
+
+
+def test_posting_list_random_adds_and_removes():
+    rng = random.Random(7)
+    postings = PostingList()
+    expected = set()
+    for _ in range(5000):
+        # Large gaps need multi-byte varints.
+        docid = rng.randrange(2 ** 52)
+        if expected and rng.random() < 0.3:
+            docid = rng.choice(sorted(expected))
+            postings.remove(docid)
+            expected.discard(docid)
+        elif docid not in expected:
+            postings.add(docid)
+            expected.add(docid)
+    check_blocks(postings)
+    assert docids(postings) == sorted(expected)
+    for docid in sorted(expected):
+        postings.remove(docid)
+    assert len(postings) == 0 and not postings.blocks
+
+
+def test_posting_list_remove_missing_is_a_no_op():
+    postings = PostingList()
+    for docid in (10, 20, 30):
+        postings.add(docid)
+    postings.remove(15)
+    postings.remove(5)
+    postings.remove(40)
+    assert docids(postings) == [10, 20, 30]
+
+
+def test_reader_seek():
+    rng = random.Random(3)
+    expected = sorted(rng.sample(range(1, 100_000), 2000))
+    postings = PostingList()
+    for docid in expected:
+        postings.add(docid)
+    reader = postings.reader()
+    # Targets only move down, as they do in a query.
+    for target in sorted(rng.sample(range(0, 100_001), 500), reverse=True):
+        below = [docid for docid in expected if docid <= target]
+        assert reader.seek(target) == (below[-1] if below else None)
+
+
+def build_corpus():
+    rng = random.Random(11)
+    documents = {}
+    index = SearchIndex()
+    for number in range(3000):
+        tweet_id = UUID(int=rng.getrandbits(128), version=4)
+        content = " ".join(rng.sample(WORDS, rng.randint(1, 5)))
+        # Some documents share a creation time, so docids get bumped.
+        index.add(tweet_id, 1_000_000 + number // 3, content)
+        documents[tweet_id] = content
+    return index, documents
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return build_corpus()
+
+
+def brute_force(index, documents, query):
+    clauses = [set().union(*map(tokenize, clause.split())) for clause in query.split(" OR ")]
+    matches = [
+        tweet_id for tweet_id, content in documents.items()
+        if any(clause <= tokenize(content) for clause in clauses)
+    ]
+    return sorted(matches, key=lambda tweet_id: index._docids[tweet_id.bytes], reverse=True)
+
+
+def search_all(index, query, limit):
+    results, cursor = [], None
+    while True:
+        page, cursor = index.search(query, limit, cursor)
+        assert len(page) <= limit
+        results.extend(page)
+        if cursor is None:
+            return results
+
+
+@pytest.mark.parametrize("query", [
+    "python", "#python", "api cache", "api cache latency", "python OR cache",
+    "api search OR #python tweet", "@someone", "missing", "missing OR ok",
+])
+def test_paged_search_matches_brute_force(corpus, query):
+    index, documents = corpus
+    assert search_all(index, query, 17) == brute_force(index, documents, query)
+
+
+def test_remove_and_update():
+    index, documents = build_corpus()
+    for tweet_id in list(documents)[:500]:
+        index.remove(tweet_id, documents.pop(tweet_id))
+    for tweet_id in list(documents)[:500]:
+        index.update(tweet_id, documents[tweet_id], "python cache")
+        documents[tweet_id] = "python cache"
+    for query in ("python", "api cache", "python OR latency"):
+        assert search_all(index, query, 50) == brute_force(index, documents, query)
+
+
+def test_snapshot_round_trip(corpus, tmp_path):
+    index, documents = corpus
+    path = str(tmp_path / "search.snapshot")
+    index.save(path)
+    loaded = SearchIndex.load(path)
+    assert len(loaded) == len(index)
+    for query in ("python", "api cache OR #python"):
+        assert search_all(loaded, query, 25) == brute_force(index, documents, query)
+
+
+def test_snapshot_version_mismatch(tmp_path, monkeypatch):
+    path = str(tmp_path / "search.snapshot")
+    SearchIndex().save(path)
+    monkeypatch.setattr(search, "_SNAPSHOT_VERSION", search._SNAPSHOT_VERSION + 1)
+    with pytest.raises(ValueError):
+        SearchIndex.load(path)
+
+
+def test_tweets_before_1970_are_indexed():
+    index = SearchIndex()
+    old, older, recent = UUID(int=1, version=4), UUID(int=2, version=4), UUID(int=3, version=4)
+    # Unix microseconds of 1969-12-31T23:59:59, 0001-01-01 and 2021-11-04.
+    index.add(old, -1_000_000, "python before the epoch")
+    index.add(older, -62_135_596_800_000_000, "python in year one")
+    index.add(recent, 1_636_020_000_000_000, "python today")
+    assert search_all(index, "python", 2) == [recent, old, older]
@@ -0,0 +1,204 @@
+# Python
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+# Pytest
+import pytest
+
+# Storage
+from storage import LogStore, SQLiteStore, TweetStore, _HEADER, decode_tweet, encode_tweet, from_micros, to_micros
+
+SEGMENT_SIZE = 4096
+
+
+def payload(content: str) -> bytes:
+    return encode_tweet(content, datetime(2021, 11, 4, 10, 0), None, uuid4().bytes)
+
+
+def segments(directory: str):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log"))
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        TweetStore()
+
+
+def test_encode_decode_round_trip():
+    author = uuid4().bytes
+    tweet_id = uuid4()
+    created = datetime(2021, 11, 4, 10, 0, 0, 123456, tzinfo=timezone.utc)
+    updated = datetime(2021, 11, 5, 1, 0, tzinfo=timezone(timedelta(hours=1)))
+    record = decode_tweet(tweet_id, encode_tweet("héllo #python", created, updated, author))
+    assert record == (tweet_id, "héllo #python", created, updated, author)
+    assert record.update_at.tzinfo == timezone.utc
+
+
+def test_times_are_utc():
+    aware = datetime(2021, 11, 4, 5, 0, tzinfo=timezone(timedelta(hours=-5)))
+    naive = datetime(2021, 11, 4, 10, 0)
+    assert to_micros(aware) == to_micros(naive) == 1_636_020_000_000_000
+    assert from_micros(to_micros(aware)) == aware
+    assert to_micros(datetime(1969, 12, 31, 23, 59, 59)) == -1_000_000
+    assert from_micros(to_micros(datetime.min)) == datetime.min.replace(tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["log", "sqlite"])
+def open_store(request, tmp_path):
+    if request.param == "log":
+        return lambda: LogStore(str(tmp_path / "tweets"), segment_size=SEGMENT_SIZE)
+    return lambda: SQLiteStore(str(tmp_path / "tweets.db"))
+
+
+def test_reopen_keeps_puts_updates_and_deletes(open_store):
+    store = open_store()
+    kept, updated, deleted = uuid4(), uuid4(), uuid4()
+    store.put_many([(kept, payload("kept")), (updated, payload("first")), (deleted, payload("gone"))])
+    store.put(updated, payload("second"))
+    assert store.delete(deleted)
+    assert not store.delete(deleted)
+    store.close()
+
+    store = open_store()
+    try:
+        assert len(store) == 2
+        assert deleted not in store
+        assert decode_tweet(kept, store.get(kept)).content == "kept"
+        assert decode_tweet(updated, store.get(updated)).content == "second"
+        assert {tweet_id for tweet_id, _ in store.scan()} == {kept, updated}
+    finally:
+        store.close()
+
+
+def test_concurrent_writers_return_after_sync(open_store):
+    store = open_store()
+    written = [uuid4() for _ in range(200)]
+
+    def write(tweet_ids):
+        for tweet_id in tweet_ids:
+            store.put(tweet_id, payload("concurrent"))
+
+    threads = [threading.Thread(target=write, args=(written[i::4],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store._committer._synced == store._committer._written
+    store.close()
+
+    store = open_store()
+    try:
+        assert all(tweet_id in store for tweet_id in written)
+    finally:
+        store.close()
+
+
+def test_log_rolls_over_segments(tmp_path):
+    directory = str(tmp_path / "tweets")
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    written = [uuid4() for _ in range(100)]
+    for tweet_id in written:
+        store.put(tweet_id, payload("x" * 100))
+    store.close()
+    assert len(segments(directory)) > 1
+
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    try:
+        assert all(decode_tweet(tweet_id, store.get(tweet_id)).content == "x" * 100 for tweet_id in written)
+    finally:
+        store.close()
+
+
+def test_log_discards_torn_tail(tmp_path):
+    directory = str(tmp_path / "tweets")
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    intact, torn = uuid4(), uuid4()
+    store.put(intact, payload("intact"))
+    store.put(torn, payload("torn"))
+    store.close()
+
+    # Flip the last byte of the second record, as a crash mid-write would leave it.
+    path = segments(directory)[-1]
+    with open(path, "r+b") as segment:
+        data = segment.read()
+        end = len(data.rstrip(b"\0"))
+        segment.seek(end - 1)
+        segment.write(bytes([data[end - 1] ^ 0xFF]))
+
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    try:
+        assert intact in store
+        assert torn not in store
+        replacement = uuid4()
+        store.put(replacement, payload("after recovery"))
+    finally:
+        store.close()
+
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    try:
+        assert len(store) == 2
+        assert decode_tweet(replacement, store.get(replacement)).content == "after recovery"
+    finally:
+        store.close()
+
+
+def test_log_ignores_truncated_header(tmp_path):
+    directory = str(tmp_path / "tweets")
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    intact = uuid4()
+    store.put(intact, payload("intact"))
+    store.close()
+
+    # A header claiming more bytes than the segment holds.
+    path = segments(directory)[-1]
+    with open(path, "r+b") as segment:
+        end = len(segment.read().rstrip(b"\0"))
+        segment.seek(end)
+        segment.write(_HEADER.pack(1, SEGMENT_SIZE, 1, uuid4().bytes))
+
+    store = LogStore(directory, segment_size=SEGMENT_SIZE)
+    try:
+        assert len(store) == 1
+        assert intact in store
+    finally:
+        store.close()
+
+
+def test_add_and_replace_are_conditional(open_store):
+    store = open_store()
+    try:
+        tweet_id, other = uuid4(), uuid4()
+        assert store.add(tweet_id, payload("first"))
+        assert not store.add(tweet_id, payload("second"))
+        assert store.add_many([(tweet_id, payload("third")), (other, payload("other"))]) == [other]
+        assert decode_tweet(tweet_id, store.get(tweet_id)).content == "first"
+
+        previous = store.replace(tweet_id, payload("edited"))
+        assert decode_tweet(tweet_id, previous).content == "first"
+        assert decode_tweet(tweet_id, store.get(tweet_id)).content == "edited"
+        assert store.delete(tweet_id)
+        assert store.replace(tweet_id, payload("resurrected")) is None
+        assert tweet_id not in store
+    finally:
+        store.close()
+
+
+def test_concurrent_adds_store_one_tweet(open_store):
+    store = open_store()
+    tweet_id = uuid4()
+    results = []
+
+    def add(content):
+        results.append(store.add(tweet_id, payload(content)))
+
+    threads = [threading.Thread(target=add, args=(str(number),)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert sorted(results) == [False] * 7 + [True]
+    finally:
+        store.close()
@@ -0,0 +1,87 @@
+# Python
+import asyncio
+from uuid import uuid4
+
+# Stream
+from stream import DISCONNECT, FanoutHub, Frame
+
+# Timeline
+from timeline import FollowGraph
+
+
+def frame(author_id, rendered=None):
+    tweet_id = uuid4()
+
+    def render():
+        if rendered is not None:
+            rendered.append(tweet_id)
+        return b'{"tweet_id": "' + str(tweet_id).encode() + b'"}'
+
+    return Frame(tweet_id, author_id, render)
+
+
+def drain(subscriber):
+    frames = []
+    while subscriber._frames:
+        frames.append(subscriber._frames.popleft())
+    return frames
+
+
+def test_frames_render_once_and_only_when_read():
+    rendered = []
+    published = frame(uuid4(), rendered)
+    FanoutHub(FollowGraph()).publish(published)
+    assert rendered == []
+    assert published.event.endswith(published.data + b"\n\n")
+    assert published.text == published.data.decode()
+    assert rendered == [published.tweet_id]
+
+
+def test_replay_is_capped_at_capacity():
+    async def run():
+        hub = FanoutHub(FollowGraph(), capacity=4, policy=DISCONNECT, replay_size=16)
+        author = uuid4()
+        published = [frame(author) for _ in range(12)]
+        for item in published:
+            hub.publish(item)
+        subscriber = hub.subscribe(None, published[1].tweet_id)
+        return published, subscriber
+
+    published, subscriber = asyncio.run(run())
+    # The backlog counts as dropped instead of tripping the disconnect policy.
+    assert not subscriber.closed
+    assert subscriber.dropped == 6
+    assert drain(subscriber) == published[-4:]
+
+
+def test_home_streams_get_followed_authors_only():
+    async def run():
+        graph = FollowGraph()
+        hub = FanoutHub(graph)
+        reader, followed, stranger = uuid4(), uuid4(), uuid4()
+        graph.follow(reader, followed)
+        home, everything = hub.subscribe(reader), hub.subscribe()
+        own, by_followed, by_stranger = frame(reader), frame(followed), frame(stranger)
+        for item in (own, by_followed, by_stranger):
+            hub.publish(item)
+        await asyncio.sleep(0)
+        return drain(home), drain(everything), [own, by_followed, by_stranger]
+
+    home, everything, published = asyncio.run(run())
+    assert home == published[:2]
+    assert everything == published
+
+
+def test_drop_oldest_counts_dropped_frames():
+    async def run():
+        hub = FanoutHub(FollowGraph(), capacity=2)
+        subscriber = hub.subscribe()
+        published = [frame(uuid4()) for _ in range(5)]
+        for item in published:
+            hub.publish(item)
+        await asyncio.sleep(0)
+        return subscriber, published
+
+    subscriber, published = asyncio.run(run())
+    assert subscriber.dropped == 3
+    assert drain(subscriber) == published[-2:]
@@ -0,0 +1,126 @@
+# Python
+import random
+import threading
+from uuid import uuid4
+
+# Timeline
+from timeline import FollowGraph, RingBuffer, TimelineEngine, decode_cursor, encode_cursor
+
+
+def entries(buffer: RingBuffer):
+    return [buffer[i] for i in range(len(buffer))]
+
+
+def test_cursor_round_trip():
+    entry = (1_636_020_000_000_000, uuid4().bytes)
+    assert decode_cursor(encode_cursor(entry)) == entry
+
+
+def test_ring_buffer_matches_sorted_window():
+    rng = random.Random(5)
+    for capacity in (1, 2, 7, 32):
+        buffer = RingBuffer(capacity)
+        expected = []
+        for _ in range(500):
+            # Mostly in order, with backfills anywhere in the window.
+            moment = rng.randrange(1000) if rng.random() < 0.4 else 1000 + len(expected)
+            entry = (moment, bytes([rng.randrange(4)]))
+            if entry not in expected and (len(expected) < capacity or entry > expected[0]):
+                expected = sorted(expected + [entry])[-capacity:]
+            buffer.append(entry)
+            assert entries(buffer) == expected
+
+
+def test_ring_buffer_ignores_entries_older_than_a_full_window():
+    buffer = RingBuffer(3)
+    for moment in (10, 20, 30):
+        buffer.append((moment, b""))
+    buffer.append((5, b""))
+    buffer.append((20, b""))
+    assert entries(buffer) == [(10, b""), (20, b""), (30, b"")]
+
+
+def test_ring_buffer_newest_before_and_discard():
+    buffer = RingBuffer(8)
+    for moment in range(1, 9):
+        buffer.append((moment, b""))
+    assert list(buffer.newest_before((4, b""))) == [(3, b""), (2, b""), (1, b"")]
+    buffer.discard({(2, b""), (5, b"")})
+    assert entries(buffer) == [(moment, b"") for moment in (1, 3, 4, 6, 7, 8)]
+    buffer.append((9, b""))
+    assert entries(buffer)[-1] == (9, b"")
+
+
+def publish(engine, author, moment):
+    tweet_id = uuid4()
+    engine.publish(author, tweet_id, moment)
+    return tweet_id
+
+
+def test_fan_out_and_paging():
+    engine = TimelineEngine(FollowGraph())
+    reader, author = uuid4(), uuid4()
+    engine.follow(reader, author)
+    posted = [publish(engine, author, moment) for moment in range(1, 26)]
+    page, cursor = engine.read(reader, 10)
+    assert page == posted[::-1][:10]
+    page, cursor = engine.read(reader, 20, cursor)
+    assert page == posted[::-1][10:] and cursor is None
+
+
+def test_unfollow_removes_followee_tweets():
+    engine = TimelineEngine(FollowGraph())
+    reader, kept, dropped = uuid4(), uuid4(), uuid4()
+    engine.follow(reader, kept)
+    engine.follow(reader, dropped)
+    own = publish(engine, reader, 1)
+    stays = publish(engine, kept, 2)
+    publish(engine, dropped, 3)
+    assert engine.unfollow(reader, dropped)
+    assert not engine.unfollow(reader, dropped)
+    assert engine.read(reader, 10)[0] == [stays, own]
+
+
+def test_celebrities_are_merged_at_read_time_and_demoted():
+    engine = TimelineEngine(FollowGraph(), outbox_capacity=4, celebrity_threshold=2)
+    celebrity = uuid4()
+    followers = [uuid4() for _ in range(3)]
+    for follower in followers:
+        engine.follow(follower, celebrity)
+    assert engine.is_celebrity(celebrity)
+    famous = publish(engine, celebrity, 1)
+    assert all(engine.read(follower, 10)[0] == [famous] for follower in followers)
+
+    engine.unfollow(followers[2], celebrity)
+    assert not engine.is_celebrity(celebrity)
+    assert engine.read(followers[2], 10)[0] == []
+    # Posts as a celebrity stay visible while they are in the outbox.
+    later = [publish(engine, celebrity, moment) for moment in range(2, 5)]
+    assert engine.read(followers[0], 10)[0] == later[::-1] + [famous]
+    # Once the outbox has rotated, only fanned out posts remain, without duplicates.
+    latest = publish(engine, celebrity, 5)
+    assert engine.read(followers[0], 10)[0] == [latest] + later[::-1]
+
+
+def test_publish_while_following_concurrently():
+    engine = TimelineEngine(FollowGraph())
+    author = uuid4()
+    stop = threading.Event()
+    errors = []
+
+    def follow():
+        try:
+            while not stop.is_set():
+                engine.follow(uuid4(), author)
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    try:
+        for moment in range(2000):
+            publish(engine, author, moment)
+    finally:
+        stop.set()
+        thread.join()
+    assert not errors
@@ -0,0 +1,287 @@
+# Python
+import base64
+import heapq
+import struct
+from threading import Lock
+from typing import Collection, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+# Timeline entries are (timestamp in microseconds, tweet_id bytes) so they
+# sort chronologically and break ties on the id.
+Entry = Tuple[int, bytes]
+
+_CURSOR = struct.Struct(">q16s")
+
+
+def encode_cursor(entry: Entry) -> str:
+    raw = _CURSOR.pack(*entry)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Entry:
+    """Raise ValueError when the cursor was not produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return _CURSOR.unpack(raw)
+    except (ValueError, struct.error) as error:
+        raise ValueError("invalid cursor") from error
+
+
+class RingBuffer:
+    """Fixed capacity buffer of entries kept in ascending order.
+
+    Once full, appending overwrites the oldest entry.
+    """
+
+    __slots__ = ("_slots", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        self._slots: List[Optional[Entry]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> Entry:
+        return self._slots[(self._start + index) % len(self._slots)]
+
+    def append(self, entry: Entry) -> None:
+        capacity = len(self._slots)
+        if self._size and entry <= self[self._size - 1]:
+            self._insert(entry)
+            return
+        if self._size < capacity:
+            self._slots[(self._start + self._size) % capacity] = entry
+            self._size += 1
+        else:
+            self._slots[self._start] = entry
+            self._start = (self._start + 1) % capacity
+
+    def _insert(self, entry: Entry) -> None:
+        # Out of order arrivals (clock skew, backfills) shift whichever side
+        # of the insertion point is shorter, in place.
+        capacity, size = len(self._slots), self._size
+        full = size == capacity
+        if full and entry < self[0]:
+            return
+        position = self.bisect(entry)
+        if position < size and self[position] == entry:
+            return
+        slots = self._slots
+        if position < size - position:
+            if full:
+                # Drop the oldest entry and move the older side down over it.
+                position -= 1
+            else:
+                self._start = (self._start - 1) % capacity
+                size += 1
+            for index in range(position):
+                slots[(self._start + index) % capacity] = slots[(self._start + index + 1) % capacity]
+        else:
+            # Moving the newer side up overwrites the oldest entry when full.
+            for index in range(size, position, -1):
+                slots[(self._start + index) % capacity] = slots[(self._start + index - 1) % capacity]
+            if full:
+                self._start = (self._start + 1) % capacity
+                position -= 1
+            else:
+                size += 1
+        slots[(self._start + position) % capacity] = entry
+        self._size = size
+
+    def discard(self, entries: Collection[Entry]) -> None:
+        """Remove every entry found in entries."""
+        kept = [self[i] for i in range(self._size) if self[i] not in entries]
+        if len(kept) == self._size:
+            return
+        self._slots[:len(kept)] = kept
+        self._slots[len(kept):] = [None] * (len(self._slots) - len(kept))
+        self._start = 0
+        self._size = len(kept)
+
+    def bisect(self, entry: Entry) -> int:
+        """Index of the first entry that is not lower than entry."""
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle] < entry:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def newest_before(self, entry: Optional[Entry]) -> Iterator[Entry]:
+        """Yield entries strictly older than entry, newest first."""
+        index = self._size if entry is None else self.bisect(entry)
+        while index > 0:
+            index -= 1
+            yield self[index]
+
+
+class FollowGraph:
+    """Who follows whom. Safe to use from any thread.
+
+    Readers get snapshots rather than the live sets, so they can iterate
+    while other threads follow and unfollow.
+    """
+
+    def __init__(self):
+        self.followers: Dict[UUID, Set[UUID]] = {}
+        self.following: Dict[UUID, Set[UUID]] = {}
+        self._lock = Lock()
+
+    def follow(self, user_id: UUID, followee_id: UUID) -> bool:
+        with self._lock:
+            followees = self.following.setdefault(user_id, set())
+            if followee_id in followees:
+                return False
+            followees.add(followee_id)
+            self.followers.setdefault(followee_id, set()).add(user_id)
+            return True
+
+    def unfollow(self, user_id: UUID, followee_id: UUID) -> bool:
+        with self._lock:
+            followees = self.following.get(user_id, set())
+            if followee_id not in followees:
+                return False
+            followees.discard(followee_id)
+            self.followers[followee_id].discard(user_id)
+            return True
+
+    def follows(self, user_id: UUID, followee_id: UUID) -> bool:
+        with self._lock:
+            return followee_id in self.following.get(user_id, ())
+
+    def follower_count(self, user_id: UUID) -> int:
+        with self._lock:
+            return len(self.followers.get(user_id, ()))
+
+    def followers_of(self, user_id: UUID) -> Tuple[UUID, ...]:
+        with self._lock:
+            return tuple(self.followers.get(user_id, ()))
+
+    def following_of(self, user_id: UUID) -> FrozenSet[UUID]:
+        with self._lock:
+            return frozenset(self.following.get(user_id, ()))
+
+    def followers_among(self, user_id: UUID, candidates: Collection[UUID]) -> List[UUID]:
+        """Followers of user_id that are in candidates, walking the smaller side."""
+        with self._lock:
+            followers = self.followers.get(user_id, set())
+            if len(followers) < len(candidates):
+                return [follower for follower in followers if follower in candidates]
+            return [candidate for candidate in candidates if candidate in followers]
+
+
+class TimelineEngine:
+    """Home timelines built by fan-out on write.
+
+    Every post lands in its author's outbox and is pushed into the home
+    buffer of each follower. Authors with more than celebrity_threshold
+    followers are not fanned out; their outboxes are merged into the home
+    timeline of each follower at read time instead. An author who drops
+    back below the threshold is fanned out again, and their outbox keeps
+    being merged until the tweets posted as a celebrity have left it.
+
+    Routes call in from the threadpool, so buffers are only touched under
+    the engine's lock.
+    """
+
+    def __init__(
+        self,
+        graph: FollowGraph,
+        home_capacity: int = 800,
+        outbox_capacity: int = 800,
+        celebrity_threshold: int = 10_000
+    ):
+        self.graph = graph
+        self.home_capacity = home_capacity
+        self.outbox_capacity = outbox_capacity
+        self.celebrity_threshold = celebrity_threshold
+        self._homes: Dict[UUID, RingBuffer] = {}
+        self._outboxes: Dict[UUID, RingBuffer] = {}
+        self._celebrities: Set[UUID] = set()
+        # Former celebrities, with how many more posts until their outbox
+        # holds only fanned out tweets.
+        self._demoted: Dict[UUID, int] = {}
+        self._lock = Lock()
+
+    def _buffer(self, buffers: Dict[UUID, RingBuffer], user_id: UUID, capacity: int) -> RingBuffer:
+        buffer = buffers.get(user_id)
+        if buffer is None:
+            buffer = buffers[user_id] = RingBuffer(capacity)
+        return buffer
+
+    def is_celebrity(self, user_id: UUID) -> bool:
+        return user_id in self._celebrities
+
+    def follow(self, user_id: UUID, followee_id: UUID) -> bool:
+        with self._lock:
+            if not self.graph.follow(user_id, followee_id):
+                return False
+            if self.graph.follower_count(followee_id) > self.celebrity_threshold:
+                self._celebrities.add(followee_id)
+                self._demoted.pop(followee_id, None)
+            return True
+
+    def unfollow(self, user_id: UUID, followee_id: UUID) -> bool:
+        """Unfollow and drop the followee's tweets from the user's home timeline."""
+        with self._lock:
+            if not self.graph.unfollow(user_id, followee_id):
+                return False
+            home = self._homes.get(user_id)
+            outbox = self._outboxes.get(followee_id)
+            if home is not None and outbox is not None:
+                home.discard({outbox[i] for i in range(len(outbox))})
+            if followee_id in self._celebrities and \
+                    self.graph.follower_count(followee_id) <= self.celebrity_threshold:
+                self._celebrities.discard(followee_id)
+                self._demoted[followee_id] = self.outbox_capacity
+            return True
+
+    def publish(self, author_id: UUID, tweet_id: UUID, created: int) -> None:
+        """Add a tweet; created is its creation time in microseconds."""
+        entry = (created, tweet_id.bytes)
+        with self._lock:
+            self._buffer(self._outboxes, author_id, self.outbox_capacity).append(entry)
+            self._buffer(self._homes, author_id, self.home_capacity).append(entry)
+            if author_id in self._celebrities:
+                return
+            remaining = self._demoted.get(author_id)
+            if remaining is not None:
+                if remaining > 1:
+                    self._demoted[author_id] = remaining - 1
+                else:
+                    del self._demoted[author_id]
+            for follower_id in self.graph.followers_of(author_id):
+                self._buffer(self._homes, follower_id, self.home_capacity).append(entry)
+
+    def read(self, user_id: UUID, limit: int, cursor: Optional[Entry] = None) -> Tuple[List[UUID], Optional[Entry]]:
+        """Return up to limit tweet ids older than cursor and the next cursor."""
+        following = self.graph.following_of(user_id)
+        with self._lock:
+            sources = []
+            home = self._homes.get(user_id)
+            if home is not None:
+                sources.append(home.newest_before(cursor))
+            for merged in (self._celebrities, self._demoted):
+                if len(following) < len(merged):
+                    authors = [author for author in following if author in merged]
+                else:
+                    authors = [author for author in merged if author in following]
+                for author_id in authors:
+                    outbox = self._outboxes.get(author_id)
+                    if outbox is not None:
+                        sources.append(outbox.newest_before(cursor))
+
+            page: List[Entry] = []
+            previous = None
+            for entry in heapq.merge(*sources, reverse=True):
+                if entry == previous:
+                    continue
+                if len(page) == limit:
+                    return [UUID(bytes=tweet_id) for _, tweet_id in page], page[-1]
+                page.append(entry)
+                previous = entry
+            return [UUID(bytes=tweet_id) for _, tweet_id in page], None
@@ -0,0 +1,66 @@
+# Python
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+from uuid import UUID
+
+User = TypeVar("User")
+
+
+class UserCache(Generic[User]):
+    """LRU-bounded cache of decoded profiles and their encoded JSON.
+
+    Every tweet by the same author shares the one cached object, and list
+    responses splice the cached JSON fragment in instead of re-encoding the
+    author each time. Call invalidate() whenever a profile changes.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[UUID], Optional[bytes]],
+        decode: Callable[[bytes], User],
+        capacity: int = 10_000
+    ):
+        self._load = load
+        self._decode = decode
+        self.capacity = capacity
+        self._entries: "OrderedDict[UUID, Tuple[User, bytes]]" = OrderedDict()
+        self._lock = Lock()
+        self._generation = 0
+
+    def _entry(self, user_id: UUID) -> Optional[Tuple[User, bytes]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                return entry
+            generation = self._generation
+        raw = self._load(user_id)
+        if raw is None:
+            return None
+        entry = (self._decode(raw), raw)
+        with self._lock:
+            # Don't cache a profile that was invalidated while it was loading.
+            if generation != self._generation:
+                return entry
+            entry = self._entries.setdefault(user_id, entry)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, user_id: UUID) -> Optional[User]:
+        entry = self._entry(user_id)
+        return None if entry is None else entry[0]
+
+    def fragment(self, user_id: UUID) -> Optional[bytes]:
+        entry = self._entry(user_id)
+        return None if entry is None else entry[1]
+
+    def invalidate(self, user_id: UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)